@@ -1,5 +1,9 @@
-from fastapi import FastAPI, Depends, Query
-from pydantic import BaseModel, HttpUrl
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl
 from typing import List, Tuple
 
 from llm_engineering.application.settings import get_settings, Settings
@@ -10,30 +14,48 @@ from fastapi import HTTPException
 from loguru import logger
 
 import hashlib
+import json
 from llm_engineering.application.services.web_loader import WebLoaderService
 
 # Configure logging once
 setup_logging()
 
-app = FastAPI(title="LLM Handbook Ground-Up (Services + Logging + Mini RAG)")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build a single RAGService instance for the app lifetime, once, before serving requests.
+    # Building loads the embedding model and connects to Mongo/Qdrant, so keep it off the loop.
+    settings = get_settings()
+    app.state.rag = await asyncio.to_thread(RAGService.build, settings)
+    app.state.hello = HelloService(settings=settings)
+    # one loader (and HTTP connection pool) shared by all ingest requests
+    app.state.web_loader = WebLoaderService()
+
+    # Load the model in Ollama (and prime the client's connection) so the first /ask isn't cold
+    if app.state.rag.llm is not None and settings.ollama_warmup:
+        await app.state.rag.llm.warm_up()
+    yield
+    await app.state.web_loader.aclose()
+    # logging is enqueued; drain pending records before shutting down
+    await logger.complete()
+
+
+app = FastAPI(title="LLM Handbook Ground-Up (Services + Logging + Mini RAG)", lifespan=lifespan)
 
 # --- Dependencies ---
-def settings_dep() -> Settings:
+# async so FastAPI resolves them on the event loop instead of the threadpool
+async def settings_dep() -> Settings:
     return get_settings()
 
-def hello_service_dep(settings: Settings = Depends(settings_dep)) -> HelloService:
-    return HelloService(settings=settings)
+async def hello_service_dep(request: Request) -> HelloService:
+    return request.app.state.hello
+
+# The RAGService singleton is built by `lifespan` at startup; no per-request check needed.
+async def rag_service_dep(request: Request) -> RAGService:
+    return request.app.state.rag
 
-# Build a single in-memory RAGService instance for the app lifetime
-_rag_service: RAGService | None = None
-def rag_service_dep(settings: Settings = Depends(settings_dep)) -> RAGService:
-    # global variable to hold the RAGService instance.
-    global _rag_service
-    # Lazy initialization; build on first request
-    if _rag_service is None:
-         # build the RAGService using the provided settings (builder pattern with classmethod)
-        _rag_service = RAGService.build(settings)
-    return _rag_service
+async def web_loader_dep(request: Request) -> WebLoaderService:
+    return request.app.state.web_loader
 
 
 # --- Existing endpoints ---
@@ -59,30 +81,40 @@ class IndexItem(BaseModel):
     text: str
 
 @app.post("/index", tags=["rag"])
-def index(items: List[IndexItem], rag: RAGService = Depends(rag_service_dep)):
-    n = rag.index([(it.id, it.text) for it in items])
+async def index(items: List[IndexItem], rag: RAGService = Depends(rag_service_dep)):
+    n = await asyncio.to_thread(rag.index, [(it.id, it.text) for it in items])
     return {"indexed": n}
 
-@app.get("/search", tags=["rag"])
-def search(q: str, k: int = 5, rag: RAGService = Depends(rag_service_dep)):
+@app.get("/search", tags=["rag"], response_class=ORJSONResponse)
+async def search(q: str, k: int = 5, rag: RAGService = Depends(rag_service_dep)):
     """q = query string, k = top-k results"""
-    results = rag.search(q, k=k)
-    # results: List[(id, score, raw_text)]
-    
-    # returns a list of dicts containing id, score, and text, got from results which is a list of 3-element tuples
-    return [
-        {"id": doc_id, "score": round(score, 4), "text": raw}
-        for (doc_id, score, raw) in results
-    ]
+    results = await asyncio.to_thread(rag.search, q, k)
+    # results: List[Hit(id, score, text)]
+
+    # orjson serializes the Hit dataclasses natively -> [{"id", "score", "text"}, ...]
+    # Returned as an ORJSONResponse directly: one orjson.dumps call, no jsonable_encoder pass.
+    return ORJSONResponse(results)
 
 
 @app.get("/debug/mongo")
-def debug_mongo(rag: RAGService = Depends(rag_service_dep)):
+async def debug_mongo(
+    limit: int = Query(100, ge=1, le=1000),
+    include_text: bool = Query(False, description="Also return the (large) text field"),
+    rag: RAGService = Depends(rag_service_dep),
+):
+    """Streams stored docs as JSON lines: ids only by default, paginated by `limit`."""
     if rag.doc_store is None:
         return {"error": "Mongo store not enabled"}
 
-    docs = list(rag.doc_store.collection.find({}, {"_id": 1, "text": 1}))
-    return {"count": len(docs), "docs": docs}
+    projection = {"_id": 1, "text": 1} if include_text else {"_id": 1}
+    cursor = rag.doc_store.collection.find({}, projection).limit(limit)
+
+    # sync generator: Starlette iterates it in the threadpool, one doc at a time
+    def lines():
+        for doc in cursor:
+            yield json.dumps(doc, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 #--- New: RAG ask endpoint ---
@@ -96,13 +128,13 @@ from loguru import logger
 import traceback
 
 @app.get("/ask", tags=["rag"])
-def ask(
+async def ask(
     q: str = Query(..., description="User question"),
     k: int = Query(3, ge=1, le=10),
     rag: RAGService = Depends(rag_service_dep),
 ):
     try:
-        result = rag.ask(q, k=k)
+        result = await rag.ask(q, k=k)
     except Exception as e:
         logger.error("RAGService.ask crashed: {}\n{}", e, traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"RAGService.ask crashed: {type(e).__name__}: {e}")
@@ -130,14 +162,19 @@ def ask(
 
 
 @app.get("/history", tags=["meta"])
-def history(
+async def history(
     limit: int = Query(10, ge=1, le=100),
+    include_text: bool = False,
     rag: RAGService = Depends(rag_service_dep),
 ):
     if rag.history_store is None:
         raise HTTPException(status_code=503, detail="History store not configured (use_mongo=False?)")
 
-    docs = rag.history_store.recent(limit=limit)
+    docs = await asyncio.to_thread(rag.history_store.recent, limit)
+    # sources are stored as {id, score}; join the cited chunk text back on request
+    if include_text:
+        sources = [src for d in docs for src in d.get("sources", [])]
+        await asyncio.to_thread(rag.hydrate_sources, sources)
     # Convert ObjectId and datetime to strings for JSON
     cleaned = []
     for d in docs:
@@ -154,30 +191,74 @@ class IngestUrlRequest(BaseModel):
     url: HttpUrl
 
 
+class IngestUrlsRequest(BaseModel):
+    # bounded: every URL's page is held in memory until the batch is indexed
+    urls: List[HttpUrl] = Field(..., min_length=1, max_length=100)
+    # simultaneous fetches from the shared client
+    concurrency: int = Field(16, ge=1, le=32)
+
+
+def _url_doc_id(url: str, settings: Settings) -> str:
+    """Stable 16-hex-char doc id for a URL (not a security hash, just content addressing)."""
+    data = url.encode("utf-8")
+    if settings.doc_id_hash == "sha1":
+        # ids produced by older ingests
+        return hashlib.sha1(data).hexdigest()[:16]
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
 @app.post("/ingest/url", tags=["ingest"])
-def ingest_url(body: IngestUrlRequest, rag: RAGService = Depends(rag_service_dep)):
+async def ingest_url(
+    body: IngestUrlRequest,
+    rag: RAGService = Depends(rag_service_dep),
+    loader: WebLoaderService = Depends(web_loader_dep),
+):
     url = str(body.url)
 
-    loader = WebLoaderService()
     try:
-        title, text = loader.fetch(url)
+        title, text = await loader.fetch_async(url)
     except Exception as e:
         # Log full traceback in server logs
         logger.error("Ingest failed for url='{}': {}\n{}", url, e, traceback.format_exc())
         # Return readable error to client
         raise HTTPException(status_code=422, detail=f"Ingest failed: {type(e).__name__}: {e}")
 
-    doc_id = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
-    indexed = rag.index([(doc_id, text)])
+    doc_id = _url_doc_id(url, rag.settings)
+    indexed = await asyncio.to_thread(rag.index, [(doc_id, text)])
 
     return {"ok": True, "doc_id": doc_id, "title": title, "indexed_chunks": indexed, "url": url}
 
 
+@app.post("/ingest/urls", tags=["ingest"])
+async def ingest_urls(
+    body: IngestUrlsRequest,
+    rag: RAGService = Depends(rag_service_dep),
+    loader: WebLoaderService = Depends(web_loader_dep),
+):
+    """Fetch many pages concurrently, then index every page that extracted in one call."""
+    urls = [str(u) for u in body.urls]
+    results = await loader.fetch_many(urls, concurrency=body.concurrency)
+
+    docs: List[Tuple[str, str]] = []
+    items = []
+    for url, res in zip(urls, results):
+        if isinstance(res, BaseException):
+            logger.error("Ingest failed for url='{}': {}", url, res)
+            items.append({"ok": False, "url": url, "error": f"{type(res).__name__}: {res}"})
+            continue
+        title, text = res
+        doc_id = _url_doc_id(url, rag.settings)
+        docs.append((doc_id, text))
+        items.append({"ok": True, "doc_id": doc_id, "title": title, "url": url})
+
+    indexed = await asyncio.to_thread(rag.index, docs) if docs else 0
+    return {"fetched": len(docs), "failed": len(urls) - len(docs), "indexed_chunks": indexed, "items": items}
+
+
 @app.get("/debug/extract", tags=["debug"])
-def debug_extract(url: str):
-    loader = WebLoaderService()
+async def debug_extract(url: str, loader: WebLoaderService = Depends(web_loader_dep)):
     try:
-        title, text = loader.fetch(url)
+        title, text = await loader.fetch_async(url)
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"{type(e).__name__}: {e}")
 
@@ -4,17 +4,22 @@ from loguru import logger
 from llm_engineering.application.settings import get_settings
 
 def setup_logging() -> None:
-    """Configure Loguru once, based on Settings.debug."""
+    """Configure Loguru once, based on Settings.debug / Settings.app_env."""
     settings = get_settings()
+    production = settings.app_env == "production"
 
     logger.remove()  # remove default handler(s) to avoid duplicates on reload
     logger.add(
         sys.stdout,
-        level="DEBUG" if settings.debug else "INFO",
+        level="DEBUG" if settings.debug and not production else "INFO",
         format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
                "<level>{level: <8}</level> | "
                "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
                "<level>{message}</level>",
+        # structured JSON lines in production (cheaper to parse downstream than colorized text)
+        serialize=production,
+        # hand records to a background writer so logging never blocks the request path
+        enqueue=True,
         backtrace=False,
         diagnose=False,
     )
@@ -1,9 +1,33 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Tuple
 import re
 
 
+# cookie/privacy common snippets
+BAD_PHRASES = (
+    "cookie", "privacy policy", "terms of service", "accept all", "manage cookies",
+    "subscribe", "sign in", "log in", "newsletter", "all rights reserved",
+)
+
+# compiled once; these run per line / per block on every page
+_RE_BLANKS = re.compile(r"\n{3,}")
+_RE_SENT_SPLIT = re.compile(r"(?<=[\.\!\?])\s+")
+_RE_NAV = re.compile(r"[-–—_=•\s]{5,}")
+_RE_HEADING = re.compile(r"^(step|chapter|overview|introduction|installation)\b")
+_RE_BOILER = re.compile("|".join(map(re.escape, BAD_PHRASES)))
+# whitespace (other than the newline) at the end of each line
+_RE_TRAILING_WS = re.compile(r"[^\S\n]+$", re.MULTILINE)
+
+# one C-level pass: every other line break str.splitlines() knows -> "\n",
+# zero-width space / BOM -> " "
+_NORM_TABLE = str.maketrans({
+    **dict.fromkeys("\r\v\f\x1c\x1d\x1e\x85\u2028\u2029", "\n"),
+    "\u200b": " ",
+    "\ufeff": " ",
+})
+
+
 @dataclass
 class ChunkerService:
     """
@@ -13,7 +37,8 @@ class ChunkerService:
     - Drops obvious boilerplate-ish lines
     - Accumulates blocks into chunks by size targets
     - Uses block overlap (meaningful overlap)
-    Returns (chunk_id, chunk_text) pairs.
+    Yields (chunk_id, chunk_text) pairs as they are produced, so only the
+    chunk being built is held in memory (use list(...) if you need them all).
     """
 
     target_chars = 350
@@ -21,60 +46,78 @@ class ChunkerService:
     max_chars    = 700
     overlap_blocks = 1
 
-    def chunk(self, doc_id: str, text: str) -> List[Tuple[str, str]]:
+    def chunk(self, doc_id: str, text: str) -> Iterator[Tuple[str, str]]:
+        # Final pass: self-contained start heuristic (cheap improvement)
+        return self._fix_pronoun_starts(self._iter_chunks(doc_id, text))
+
+    def _iter_chunks(self, doc_id: str, text: str) -> Iterator[Tuple[str, str]]:
         text = self._normalize(text)
         if not text:
-            return []
+            return
 
         blocks = self._to_blocks(text)
         if not blocks:
-            return []
+            return
 
         # Merge tiny blocks so embeddings have enough signal
         blocks = self._merge_tiny_blocks(blocks)
 
-        chunks: list[tuple[str, str]] = []
+        # chunks flushed while handling the current block; drained (yielded) after each block
+        pending: list[tuple[str, str]] = []
         current_blocks: list[str] = []
         current_len = 0
+        # leading entries of current_blocks that were carried over from the previous chunk
+        carried = 0
         idx = 0
 
         def flush():
-            nonlocal idx, current_blocks, current_len
-            if not current_blocks:
+            nonlocal idx
+            # a chunk made only of carried overlap would just repeat the previous chunk's tail
+            if len(current_blocks) <= carried:
                 return
             chunk_text = "\n\n".join(current_blocks).strip()
             if chunk_text:
                 chunk_id = f"{doc_id}#chunk{idx}"
-                chunks.append((chunk_id, chunk_text))
+                pending.append((chunk_id, chunk_text))
                 idx += 1
 
-        for b in blocks:
+        def drop_carry():
+            nonlocal current_blocks, current_len, carried
+            current_blocks = []
+            current_len = 0
+            carried = 0
+
+        def flush_with_overlap():
+            # flush, then carry the last N paragraphs into the next chunk (overlap).
+            # Taken from the tail of current_blocks, so only the last block(s) get split,
+            # never the whole flushed chunk.
+            nonlocal current_blocks, current_len, carried
+            if len(current_blocks) <= carried:
+                # nothing new since the last flush: the carry is dropped, not emitted again
+                drop_carry()
+                return
+            flush()
+            carry: list[str] = []
+            if self.overlap_blocks > 0 and idx > 0:
+                for blk in reversed(current_blocks):
+                    carry[:0] = blk.split("\n\n")
+                    if len(carry) >= self.overlap_blocks:
+                        break
+                carry = carry[-self.overlap_blocks:]
+            current_blocks = carry
+            current_len = sum(len(x) for x in carry) + 2 * max(0, len(carry) - 1)
+            carried = len(carry)
+
+        def append(b: str):
+            nonlocal current_len
             blen = len(b)
 
-            # If a single block is huge, split it (sentence-ish fallback)
-            if blen > self.max_chars:
-                for piece in self._split_large_block(b):
-                    self._append_block(piece, chunks, doc_id, current_blocks_ref=lambda: current_blocks,
-                                       set_current_blocks=lambda v: self._set_list("current_blocks", v, locals()),
-                                       current_len_ref=lambda: current_len,
-                                       set_current_len=lambda v: self._set_int("current_len", v, locals()),
-                                       flush=flush)
-                continue
-
             # If adding this block would exceed max, flush current chunk first
             if current_len > 0 and (current_len + blen + 2) > self.max_chars:
-                flush()
-
-                # overlap: carry last N blocks into next chunk
-                if self.overlap_blocks > 0 and chunks:
-                    prev_text = chunks[-1][1]
-                    prev_blocks = prev_text.split("\n\n")
-                    carry = prev_blocks[-self.overlap_blocks:]
-                    current_blocks = carry[:]  # new list
-                    current_len = sum(len(x) for x in current_blocks) + 2 * max(0, len(current_blocks) - 1)
-                else:
-                    current_blocks = []
-                    current_len = 0
+                flush_with_overlap()
+                # carried overlap + this block still too big: start the next chunk without overlap
+                if current_len > 0 and (current_len + blen + 2) > self.max_chars:
+                    drop_carry()
 
             # Append block
             current_blocks.append(b)
@@ -82,36 +125,44 @@ class ChunkerService:
 
             # If we reached target and we're above min, flush
             if current_len >= self.target_chars and current_len >= self.min_chars:
-                flush()
-                # overlap carry
-                if self.overlap_blocks > 0 and chunks:
-                    prev_text = chunks[-1][1]
-                    prev_blocks = prev_text.split("\n\n")
-                    carry = prev_blocks[-self.overlap_blocks:]
-                    current_blocks = carry[:]
-                    current_len = sum(len(x) for x in current_blocks) + 2 * max(0, len(current_blocks) - 1)
-                else:
-                    current_blocks = []
-                    current_len = 0
+                flush_with_overlap()
 
-        # Flush remaining
-        flush()
+        for b in blocks:
+            # If a single block is huge, split it (sentence-ish fallback)
+            # and feed the pieces through the same path as normal blocks
+            if len(b) > self.max_chars:
+                for piece in self._split_large_block(b):
+                    append(piece)
+            else:
+                append(b)
 
-        # Final pass: self-contained start heuristic (cheap improvement)
-        chunks = self._fix_pronoun_starts(chunks)
+            if pending:
+                yield from pending
+                pending.clear()
 
-        return chunks
+        # Flush remaining (skipped if it's only the carried overlap)
+        flush()
+        yield from pending
+
+    def clean(self, text: str) -> str:
+        """
+        Same normalization and boilerplate filtering as chunk(), without the chunk
+        accumulation: for docs that fit in one chunk. "" if nothing survives.
+        """
+        text = self._normalize(text)
+        if not text:
+            return ""
+        return "\n\n".join(self._to_blocks(text))
 
     # ---------------- helpers ----------------
 
     def _normalize(self, text: str) -> str:
-        text = (text or "").replace("\r\n", "\n").replace("\r", "\n")
-        # remove zero-width spaces
-        text = text.replace("\u200b", " ").replace("\ufeff", " ")
+        # "\r\n" first, otherwise the table would turn it into a paragraph break
+        text = (text or "").replace("\r\n", "\n").translate(_NORM_TABLE)
         # collapse trailing spaces per line
-        text = "\n".join(line.rstrip() for line in text.splitlines())
+        text = _RE_TRAILING_WS.sub("", text)
         # collapse many blank lines
-        text = re.sub(r"\n{3,}", "\n\n", text)
+        text = _RE_BLANKS.sub("\n\n", text)
         return text.strip()
 
     def _to_blocks(self, text: str) -> List[str]:
@@ -144,12 +195,14 @@ class ChunkerService:
 
         blocks: list[str] = []
         current: list[str] = []
+        cur_len = 0  # running sum(len(x) for x in current)
 
         def flush():
-            nonlocal current
+            nonlocal current, cur_len
             if current:
                 blocks.append(" ".join(current).strip())
                 current = []
+                cur_len = 0
 
         for ln in lines:
             # headings become their own block boundary
@@ -159,9 +212,10 @@ class ChunkerService:
                 continue
 
             current.append(ln)
+            cur_len += len(ln)
 
             # flush once the block is "big enough"
-            if sum(len(x) for x in current) >= 300:
+            if cur_len >= 300:
                 flush()
 
         flush()
@@ -177,15 +231,11 @@ class ChunkerService:
             return True
 
         # cookie/privacy common snippets
-        bad_phrases = [
-            "cookie", "privacy policy", "terms of service", "accept all", "manage cookies",
-            "subscribe", "sign in", "log in", "newsletter", "all rights reserved"
-        ]
-        if any(p in l for p in bad_phrases) and len(line) < 120:
+        if len(line) < 120 and _RE_BOILER.search(l):
             return True
 
         # nav-like lines (lots of separators or menu-ish)
-        if re.fullmatch(r"[-–—_=•\s]{5,}", line):
+        if _RE_NAV.fullmatch(line):
             return True
 
         # super link-y / breadcrumb-ish
@@ -198,7 +248,7 @@ class ChunkerService:
         # e.g., "Overview", "Step 3", "Installation", "### Title"
         if line.startswith("#"):
             return True
-        if len(line) <= 80 and re.match(r"^(step|chapter|overview|introduction|installation)\b", line.lower()):
+        if len(line) <= 80 and _RE_HEADING.match(line.lower()):
             return True
         # Title Case-ish short lines
         if len(line) <= 60 and sum(ch.isupper() for ch in line) >= 2:
@@ -224,7 +274,7 @@ class ChunkerService:
 
     def _split_large_block(self, block: str) -> List[str]:
         # Sentence-ish split on . ! ? followed by space/newline (very simple)
-        parts = re.split(r"(?<=[\.\!\?])\s+", block)
+        parts = _RE_SENT_SPLIT.split(block)
         pieces: list[str] = []
         cur = ""
         for p in parts:
@@ -240,9 +290,9 @@ class ChunkerService:
             pieces.append(cur.strip())
         return pieces
 
-    def _fix_pronoun_starts(self, chunks: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    def _fix_pronoun_starts(self, chunks: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+        # streaming: only the previous chunk is kept around
         pronouns = ("it ", "this ", "they ", "these ", "also ", "therefore ", "however ")
-        fixed: list[tuple[str, str]] = []
         prev_text = ""
         for chunk_id, chunk_text in chunks:
             start = chunk_text.strip().lower()
@@ -250,6 +300,5 @@ class ChunkerService:
                 # prepend a short tail of prev chunk (last paragraph) to give context
                 tail = prev_text.split("\n\n")[-1].strip()
                 chunk_text = (tail + "\n\n" + chunk_text).strip()
-            fixed.append((chunk_id, chunk_text))
+            yield (chunk_id, chunk_text)
             prev_text = chunk_text
-        return fixed
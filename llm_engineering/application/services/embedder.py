@@ -1,25 +1,69 @@
-# Minimal "embedder": tokenize → term-frequency dict (no external libs)
+# Minimal "embedder": tokenize → term-frequency dict (batch form returns a sparse matrix)
 from collections import Counter
-from typing import Dict, List
+from typing import Dict, Iterable, List
 import re
 
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# compiled once; used for every indexed chunk and every query
+_TOKEN_RE = re.compile(r"[a-zA-Z]+")
+
 
 class SimpleEmbedder:
     def __init__(self, stopwords: List[str] | None = None):
-        self.stopwords = set(stopwords or [])
-
-    def _tokens(self, text: str) -> List[str]:
-        # lowercase, keep words only
-        toks = re.findall(r"[a-zA-Z]+", text.lower())  # toks will be like ['this', 'is', 'a', 'test']
-        # for filltering stopwords
-        return [t for t in toks if t not in self.stopwords]
+        # frozen: read-only after init, compact hash table for the per-token lookups
+        self.stopwords = frozenset(stopwords or [])
 
     def embed(self, text: str) -> Dict[str, float]:
         # term frequency vector stored as a dict: {term: tf}
-        toks = self._tokens(text)
-        counts = Counter(toks)
+        # tokens: lowercase, words only, stopwords filtered
+        # (e.g. "This is a test" -> ['this', 'is', 'a', 'test'])
+        # tokenize + count in one pass (no intermediate token list)
+        counts: Counter = Counter()
+        sw = self.stopwords
+        for m in _TOKEN_RE.finditer(text.lower()):
+            t = m.group(0)
+            if t not in sw:
+                counts[t] += 1
         if not counts:
             return {}
         # normalize by max term frequency (common TF variant)
         max_tf = max(counts.values())
-        return {term: c / max_tf for term, c in counts.items()} # return normalized tf vector a dict containing terms and their frequencies
\ No newline at end of file
+        return {term: c / max_tf for term, c in counts.items()} # return normalized tf vector a dict containing terms and their frequencies
+
+    def embed_many(self, texts: Iterable[str]) -> List[Dict[str, float]]:
+        # batch variant, e.g. for all chunks of a document
+        embed = self.embed
+        return [embed(t) for t in texts]
+
+    def embed_batch(self, texts: List[str], vocab: Dict[str, int]) -> csr_matrix:
+        """
+        TF vectors for many texts as one (N, |vocab|) CSR matrix with L2-normalized rows.
+
+        `vocab` (term -> column) is shared with the caller; unseen terms are appended to it.
+        Rows are cosine-equivalent to embed(): its max-tf scaling cancels out after L2 normalization.
+        """
+        sw = self.stopwords
+        indptr = [0]
+        indices: list[int] = []
+        counts_flat: list[int] = []
+        for text in texts:
+            counts = Counter(t for t in _TOKEN_RE.findall(text.lower()) if t not in sw)
+            for term, c in counts.items():
+                indices.append(vocab.setdefault(term, len(vocab)))
+                counts_flat.append(c)
+            indptr.append(len(indices))
+
+        data = np.asarray(counts_flat, dtype=np.float32)
+        indptr_arr = np.asarray(indptr, dtype=np.int64)
+        # row id of every stored value -> per-row L2 norms in one bincount
+        rows = np.repeat(np.arange(len(texts)), np.diff(indptr_arr))
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=len(texts))).astype(np.float32)
+        if data.size:
+            data /= norms[rows]
+
+        return csr_matrix(
+            (data, np.asarray(indices, dtype=np.int32), indptr_arr),
+            shape=(len(texts), len(vocab)),
+        )
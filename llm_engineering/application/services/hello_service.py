@@ -1,18 +1,22 @@
 # llm_engineering/application/services/hello_service.py
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from loguru import logger
 from llm_engineering.application.settings import Settings
 
 @dataclass
 class HelloService:
     settings: Settings
+    # settings-derived values, computed once instead of on every greet()
+    _level: str = field(init=False, repr=False)
+    _env: str = field(init=False, repr=False)
+    _base: dict = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._level = "DEBUG" if self.settings.debug else "INFO"
+        self._env = self.settings.app_env
+        self._base = {"environment": self.settings.app_env, "debug": self.settings.debug}
 
     def greet(self, name: str | None = None) -> dict:
         who = (name or "friend").strip()
-        level = "DEBUG" if self.settings.debug else "INFO"
-        logger.log(level, "Greeting requested: name='{}', env='{}'", who, self.settings.app_env)
-        return {
-            "message": f"Hello, {who}!",
-            "environment": self.settings.app_env,
-            "debug": self.settings.debug,
-        }
+        logger.log(self._level, "Greeting requested: name='{}', env='{}'", who, self._env)
+        return {"message": f"Hello, {who}!", **self._base}
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, Any
-from collections.abc import Mapping
+from collections.abc import Callable, Mapping
 
 from loguru import logger
 import ollama
@@ -10,11 +10,22 @@ import ollama
 from llm_engineering.application.settings import Settings
 
 
+# type(resp) -> text extractor, picked on the first response of each type.
+# The ollama client only returns a handful of shapes, so after warm-up every
+# _extract_text call is one dict lookup + one attribute chain.
+_EXTRACTORS: dict[type, Callable[[Any], str]] = {}
+
+
 @dataclass
 class LLMClient:
     """Thin wrapper around a local Ollama model (e.g. phi3:latest, qwen3:4b)."""
     model: str
     host: str
+    # Built once so the underlying httpx pool (and its keep-alive connection) is reused across calls
+    _client: ollama.AsyncClient = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._client = ollama.AsyncClient(host=self.host)
 
     @classmethod
     def from_settings(cls, settings: Settings) -> Optional["LLMClient"]:
@@ -80,6 +91,60 @@ class LLMClient:
         - generate(): {"response": "..."}
         - typed: resp.message.content or resp.response
         """
+        extractor = _EXTRACTORS.get(type(resp))
+        if extractor is None:
+            extractor = _EXTRACTORS[type(resp)] = cls._pick_extractor(resp)
+        return extractor(resp)
+
+    @classmethod
+    def _pick_extractor(cls, resp: Any) -> Callable[[Any], str]:
+        # Probe the first response of a type once; every extractor falls back
+        # to the generic probing path if a later instance doesn't fit.
+        if isinstance(resp, Mapping):
+            return cls._extract_from_mapping
+        if getattr(resp, "message", None) is not None:
+            return cls._extract_from_message
+        if getattr(resp, "response", None) is not None:
+            return cls._extract_from_response
+        return cls._extract_generic
+
+    @classmethod
+    def _extract_from_message(cls, resp: Any) -> str:
+        # typed chat() response: resp.message.content
+        msg = getattr(resp, "message", None)
+        content = getattr(msg, "content", None) if msg is not None else None
+        if content is not None:
+            return str(content).strip()
+        return cls._extract_generic(resp)
+
+    @classmethod
+    def _extract_from_response(cls, resp: Any) -> str:
+        # typed generate() response: resp.response
+        direct = getattr(resp, "response", None)
+        if direct is not None:
+            return str(direct).strip()
+        return cls._extract_generic(resp)
+
+    @staticmethod
+    def _extract_from_mapping(d: Mapping) -> str:
+        if "message" in d:
+            msg = d.get("message") or {}
+            # message may be dict OR object-like
+            if isinstance(msg, Mapping):
+                return str(msg.get("content") or "").strip()
+            # object-like
+            content = getattr(msg, "content", None)
+            if content is not None:
+                return str(content).strip()
+
+        if "response" in d:
+            return str(d.get("response") or "").strip()
+
+        return ""
+
+    @classmethod
+    def _extract_generic(cls, resp: Any) -> str:
+        """Full probing path for shapes not covered by a specialized extractor."""
         # 1) Try attribute access first (works for typed objects)
         try:
             msg = getattr(resp, "message", None)
@@ -101,34 +166,31 @@ class LLMClient:
         d = cls._to_dict(resp)
         if not d:
             return ""
+        return cls._extract_from_mapping(d)
 
-        if "message" in d:
-            msg = d.get("message") or {}
-            # message may be dict OR object-like
-            if isinstance(msg, Mapping):
-                return str(msg.get("content") or "").strip()
-            # object-like
-            content = getattr(msg, "content", None)
-            if content is not None:
-                return str(content).strip()
-
-        if "response" in d:
-            return str(d.get("response") or "").strip()
-
-        return ""
+    async def warm_up(self) -> None:
+        """
+        Send a 1-token prompt so Ollama loads the model and our connection pool is open
+        before the first real request. Failures are logged, never raised.
+        """
+        try:
+            await self._client.generate(model=self.model, prompt="ok", options={"num_predict": 1})
+            logger.info("Ollama model '{}' warmed up at {}", self.model, self.host)
+        except Exception as e:
+            logger.warning("Ollama warm-up failed (model='{}', host='{}'): {}", self.model, self.host, e)
 
-    def generate(self, prompt: str, max_tokens: int = 256, temperature: float = 0.1) -> str:
+    async def generate(self, prompt: str, max_tokens: int = 256, temperature: float = 0.1) -> str:
         """
         Use chat() first, fall back to generate() if needed.
         Returns the assistant text or "" if nothing was produced.
+
+        Async so the event loop stays free while Ollama is generating.
         """
         messages = [{"role": "user", "content": prompt}]
 
         try:
-            client = ollama.Client(host=self.host)
-
             # 1) Try chat()
-            chat_resp = client.chat(
+            chat_resp = await self._client.chat(
                 model=self.model,
                 messages=messages,
                 options={"num_predict": max_tokens, "temperature": temperature},
@@ -144,7 +206,7 @@ class LLMClient:
             )
 
             # 2) Fall back to generate()
-            gen_resp = client.generate(
+            gen_resp = await self._client.generate(
                 model=self.model,
                 prompt=prompt,
                 options={"num_predict": max_tokens, "temperature": temperature},
@@ -0,0 +1,25 @@
+from __future__ import annotations
+from functools import lru_cache
+
+from loguru import logger
+from pymongo import MongoClient
+
+
+@lru_cache(maxsize=4)
+def get_client(uri: str, compressors: str = "zstd,zlib") -> MongoClient:
+    """
+    One pooled MongoClient per (uri, compressors), shared by every store.
+
+    MongoClient is thread-safe and keeps its own connection pool, so the doc store
+    and the interaction store reuse the same sockets instead of opening two pools.
+    `compressors` is the wire-compression preference list, e.g. "zstd,zlib"
+    (the server picks the first one it also supports).
+    """
+    logger.info("Connecting to MongoDB at {}", uri)
+    return MongoClient(
+        uri,
+        maxPoolSize=50,
+        minPoolSize=5,
+        retryWrites=True,
+        compressors=compressors,
+    )
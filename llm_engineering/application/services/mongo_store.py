@@ -1,9 +1,56 @@
 from __future__ import annotations
-from typing import Any, Iterable, Union, Dict, Tuple, List, Optional
+from typing import Any, Callable, Iterable, Union, Dict, Tuple, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+import threading
 
+from cachetools import TTLCache
 from loguru import logger
-from pymongo import MongoClient, UpdateOne
+from pymongo import ASCENDING, DESCENDING, UpdateOne, WriteConcern
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from llm_engineering.application.services.mongo_client import get_client
+
+# server error code for duplicate _id
+_DUPLICATE_KEY = 11000
+
+# shared default for docs without tags (BSON encodes a tuple as an array)
+_NO_TAGS: tuple = ()
+
+
+# --- upsert_documents input -> (doc_id, $set fields) ---
+
+def _doc_from_tuple(it: Tuple[str, str], now: datetime) -> tuple[Any, dict]:
+    # plain (id, text): no title/url, so no meta dict needed
+    # (unpacking also rejects 3-tuples and other wrong shapes)
+    doc_id, text = it
+    return doc_id, {"text": text, "source": "manual", "tags": _NO_TAGS, "updated_at": now}
+
+
+def _doc_from_dict(it: Dict[str, Any], now: datetime) -> tuple[Any, dict]:
+    set_doc = {
+        "text": it["text"],
+        "source": it.get("source", "manual"),
+        "tags": it.get("tags") or _NO_TAGS,
+        "updated_at": now,
+    }
+    # only store optional fields if provided
+    title = it.get("title")
+    if title is not None:
+        set_doc["title"] = title
+    url = it.get("url")
+    if url is not None:
+        set_doc["url"] = url
+    return it["id"], set_doc
+
+
+def _doc_from_item(it: Any, now: datetime) -> tuple[Any, dict]:
+    if isinstance(it, tuple):
+        doc_id, text = it
+        return _doc_from_tuple((doc_id, text), now)
+    if isinstance(it, dict):
+        return _doc_from_dict(it, now)
+    raise TypeError(f"Unsupported document item type: {type(it)}")
 
 
 class MongoDocumentStore:
@@ -14,104 +61,224 @@ class MongoDocumentStore:
     DocDict = Dict[str, Any]                  # {"id":..., "text":..., "source":...}
     DocItem = Union[DocTuple, DocDict]
 
-    def __init__(self, uri: str, db_name: str, collection_name: str):
-        logger.info("Connecting to MongoDB at {}", uri)
-        self.client = MongoClient(uri)
+    # ops per bulk_write round-trip (keeps each request well under the 16 MB message limit)
+    BULK_BATCH_SIZE = 500
+    # batches written concurrently (the shared client pools up to 50 connections)
+    BULK_WORKERS = 4
+    # max docs per get_texts cursor batch
+    GET_TEXTS_BATCH_SIZE = 1000
+
+    def __init__(self, uri: str, db_name: str, collection_name: str, compressors: str = "zstd,zlib"):
+        self.client = get_client(uri, compressors)
         self.collection = self.client[db_name][collection_name]
+        # doc_id -> text for get_texts(); TTLCache isn't thread-safe, hence the lock
+        self._text_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+        self._text_lock = threading.Lock()
 
-    def upsert_documents(self, items: List[DocItem]) -> int:
+    def upsert_documents(self, items: List[DocItem], mode: str = "upsert") -> int:
         """
         Accepts either:
         - (doc_id, text)
         - {"id": doc_id, "text": text, "source": "...", "title": "...", "url": "...", "tags": [...]}
 
         Uses doc_id as _id so we don't create duplicates on re-index.
+
+        mode:
+        - "upsert": one UpdateOne(upsert=True) per doc (an index probe per op on the server)
+        - "insert": plain unordered insert_many; fails on existing _ids
+        - "auto":   insert_many first, then upsert only the docs that hit a duplicate _id
+                    (cheapest for fresh corpora, same end state as "upsert")
         """
         if not items:
             return 0
+        if mode not in ("upsert", "insert", "auto"):
+            raise ValueError(f"Unsupported write mode: {mode!r}")
 
-        ops: list[UpdateOne] = []
         now = datetime.now(timezone.utc)
+        # (doc_id, fields to set); batches are normally homogeneous, so pick one builder
+        # for the whole batch and only type-check per item if that fails. The tuple builder
+        # unpacks, so it's only used when every item is a plain tuple (a 2-key dict or a
+        # 2-char string would unpack without error)
+        build = _doc_from_tuple if all(type(it) is tuple for it in items) else _doc_from_dict
+        try:
+            docs = [build(it, now) for it in items]
+        except (TypeError, KeyError, ValueError):
+            # mixed batch (or a bad item: _doc_from_item raises the proper error)
+            docs = [_doc_from_item(it, now) for it in items]
 
-        for it in items:
-            # --- normalize input ---
-            if isinstance(it, tuple):
-                doc_id, text = it
-                meta = {"source": "manual", "title": None, "url": None, "tags": []}
-            elif isinstance(it, dict):
-                doc_id = it["id"]
-                text = it["text"]
-                meta = {
-                    "source": it.get("source", "manual"),
-                    "title": it.get("title"),
-                    "url": it.get("url"),
-                    "tags": it.get("tags") or [],
-                }
+        try:
+            if mode == "upsert":
+                count = self._upsert(docs, now)
             else:
-                raise TypeError(f"Unsupported document item type: {type(it)}")
-
-            # --- build update doc ---
-            set_doc = {
-                "text": text,
-                "source": meta["source"],
-                "tags": meta["tags"],
-                "updated_at": now,
-            }
-
-            # only store optional fields if provided
-            if meta["title"] is not None:
-                set_doc["title"] = meta["title"]
-            if meta["url"] is not None:
-                set_doc["url"] = meta["url"]
-
-            ops.append(
-                UpdateOne(
-                    {"_id": doc_id},
-                    {
-                        "$set": set_doc,
-                        "$setOnInsert": {"created_at": now},
-                    },
-                    upsert=True,
-                )
+                count = self._insert(docs, now, upsert_duplicates=(mode == "auto"))
+        finally:
+            # drop cached texts after the write so a concurrent get_texts can't re-cache the old version
+            with self._text_lock:
+                for doc_id, _ in docs:
+                    self._text_cache.pop(str(doc_id), None)
+        logger.info("Mongo inserted/upserted/updated {} document(s)", count)
+        return count
+
+    def _upsert(self, docs: list[tuple[Any, dict]], now: datetime) -> int:
+        # same object for every op; bulk_write only reads it while encoding
+        on_insert = {"created_at": now}
+        ops = [
+            UpdateOne(
+                {"_id": doc_id},
+                {
+                    "$set": set_doc,
+                    "$setOnInsert": on_insert,
+                },
+                upsert=True,
             )
+            for doc_id, set_doc in docs
+        ]
 
-        result = self.collection.bulk_write(ops, ordered=False)
-        count = (result.upserted_count or 0) + (result.modified_count or 0)
-        logger.info("Mongo upserted/updated {} document(s)", count)
-        return count
+        def write(batch: list[UpdateOne]) -> int:
+            result = self.collection.bulk_write(batch, ordered=False)
+            return (result.upserted_count or 0) + (result.modified_count or 0)
+
+        return self._map_batches(write, ops)
+
+    def _insert(self, docs: list[tuple[Any, dict]], now: datetime, upsert_duplicates: bool) -> int:
+        def write(batch: list[tuple[Any, dict]]) -> int:
+            try:
+                result = self.collection.insert_many(
+                    [{"_id": doc_id, **set_doc, "created_at": now} for doc_id, set_doc in batch],
+                    ordered=False,
+                )
+                return len(result.inserted_ids)
+            except BulkWriteError as bwe:
+                errors = bwe.details.get("writeErrors", [])
+                dup_idx = [e["index"] for e in errors if e.get("code") == _DUPLICATE_KEY]
+                # anything other than "already exists" is a real failure
+                if not upsert_duplicates or len(dup_idx) != len(errors):
+                    raise
+                return bwe.details.get("nInserted", 0) + self._upsert([batch[i] for i in dup_idx], now)
+
+        return self._map_batches(write, docs)
+
+    def _map_batches(self, write: Callable[[list], int], seq: list) -> int:
+        """Run write() over BULK_BATCH_SIZE slices of seq, up to BULK_WORKERS at a time; sums the counts."""
+        size = self.BULK_BATCH_SIZE
+        batches = [seq[start:start + size] for start in range(0, len(seq), size)]
+        if len(batches) <= 1:
+            # nothing to overlap
+            return sum(write(batch) for batch in batches)
+        with ThreadPoolExecutor(max_workers=min(self.BULK_WORKERS, len(batches))) as pool:
+            return sum(pool.map(write, batches))
+
+    def get_index_state(self, doc_ids: list[str]) -> dict[str, tuple[str, int]]:
+        """(content_hash, chunk_count) recorded by set_index_state() for the given doc_ids."""
+        if not doc_ids:
+            return {}
+        cursor = self.collection.find(
+            {"_id": {"$in": doc_ids}, "content_hash": {"$exists": True}},
+            {"content_hash": 1, "chunk_count": 1},
+        )
+        return {str(doc["_id"]): (doc["content_hash"], doc.get("chunk_count", 0)) for doc in cursor}
+
+    def set_index_state(self, state: dict[str, tuple[str, int]]) -> None:
+        """Record which content (hash) each doc was chunked/embedded from, and into how many chunks."""
+        ops = [
+            UpdateOne({"_id": doc_id}, {"$set": {"content_hash": content_hash, "chunk_count": chunk_count}})
+            for doc_id, (content_hash, chunk_count) in state.items()
+        ]
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
 
     def get_texts(self, doc_ids: list[str]) -> dict[str, str]:
-        """Fetch texts for given doc_ids. (We may use this later for /ask)."""
+        """
+        Fetch texts for given doc_ids ("" for unknown ids).
+        Recently fetched ones come from an in-process TTL cache.
+        """
         if not doc_ids:
             return {}
-        # Query MongoDB for documents with _id in doc_ids, projecting only the text field (1).
-        cursor = self.collection.find({"_id": {"$in": doc_ids}}, {"text": 1})
-        
-        # return a dict mapping doc_id to text
-        # doc.get("text", "") ensures we return an empty string if text is missing.
-        return {str(doc["_id"]): doc.get("text", "") for doc in cursor}
-    
+
+        texts: dict[str, str] = {}
+        missing: list[str] = []
+        with self._text_lock:
+            for doc_id in doc_ids:
+                text = self._text_cache.get(doc_id)
+                if text is None:
+                    missing.append(doc_id)
+                else:
+                    texts[doc_id] = text
+        if not missing:
+            return texts
+
+        # Query MongoDB only for the uncached ids, projecting just _id and text.
+        # One explicit batch size avoids the default 101-doc first batch + getMore round-trips.
+        cursor = (
+            self.collection
+            .find({"_id": {"$in": missing}}, {"_id": 1, "text": 1})
+            .hint([("_id", 1)])
+            .batch_size(min(len(missing), self.GET_TEXTS_BATCH_SIZE))
+        )
+
+        # every requested id gets an entry; unknown ids (or docs without text) map to ""
+        fetched = dict.fromkeys(missing, "")
+        for doc in cursor:
+            fetched[str(doc["_id"])] = doc.get("text", "")
+        with self._text_lock:
+            self._text_cache.update(fetched)
+        texts.update(fetched)
+        return texts
+
+    def hydrate_doc_snippets(self, sources: list[dict], max_chars: int) -> list[dict]:
+        """
+        Fallback for history sources ({"id": chunk_id, ...}) whose chunk text is gone:
+        sets "doc_snippet" to the first max_chars of the parent document (the doc store
+        keeps whole documents, not chunks; one $in query for all of them).
+        """
+        doc_ids = list(dict.fromkeys(_parent_doc_id(src["id"]) for src in sources))
+        texts = self.get_texts(doc_ids)
+        for src in sources:
+            src["doc_snippet"] = texts.get(_parent_doc_id(src["id"]), "")[:max_chars]
+        return sources
+
+
+def _parent_doc_id(chunk_id: str) -> str:
+    # "abc#chunk3" -> "abc"; plain doc ids pass through
+    doc_id, sep, _ = chunk_id.rpartition("#chunk")
+    return doc_id if sep else chunk_id
+
+
 class MongoInteractionStore:
     """Store /ask interactions (question, answer, sources) in MongoDB."""
 
-    def __init__(self, uri: str, db_name: str, collection_name: str):
-        logger.info("Connecting to MongoDB (interactions) at {}", uri)
-        self.client = MongoClient(uri)
-        self.collection = self.client[db_name][collection_name]
+    def __init__(self, uri: str, db_name: str, collection_name: str, compressors: str = "zstd,zlib"):
+        # same pooled client as MongoDocumentStore when the uri matches
+        self.client = get_client(uri, compressors)
+        # a log sink: primary ack only, no journal wait, so /ask isn't held up by fsync/replication
+        self.collection = self.client[db_name].get_collection(
+            collection_name, write_concern=WriteConcern(w=1, j=False)
+        )
+        self._ensure_indexes()
+
+    def _ensure_indexes(self) -> None:
+        # recent() sorts newest-first -> backwards index scan instead of an in-memory sort;
+        # sources.id answers "which questions cited this chunk". No-ops if they already exist.
+        try:
+            self.collection.create_index([("created_at", DESCENDING)])
+            self.collection.create_index([("sources.id", ASCENDING)])
+        except PyMongoError as e:
+            logger.warning("Could not create interaction indexes: {}", e)
 
     def log_interaction(
         self,
         question: str,
         answer: str,
-        hits: List[Tuple[str, float, str]],
+        hits: list,  # RAGService Hit objects (.id / .score / .text)
     ) -> None:
         now = datetime.now(timezone.utc)
+        # ids + scores only; the chunk text is joined back on read (see RAGService.hydrate_sources)
         doc = {
             "question": question,
             "answer": answer,
             "sources": [
-                {"id": doc_id, "score": score, "text": text}
-                for (doc_id, score, text) in hits
+                {"id": hit.id, "score": hit.score}
+                for hit in hits
             ],
             "created_at": now,
         }
@@ -121,7 +288,7 @@ class MongoInteractionStore:
     def recent(self, limit: int = 20) -> list[dict]:
         cursor = (
             self.collection
-            .find({}, {"question": 1, "answer": 1, "sources": 1, "created_at": 1})
+            .find({}, {"question": 1, "answer": 1, "sources.id": 1, "sources.score": 1, "created_at": 1})
             .sort("created_at", -1)
             .limit(limit)
         )
@@ -1,24 +1,75 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Tuple
+import asyncio
+import atexit
+import hashlib
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+from cachetools import TTLCache, cached
 from loguru import logger
 
 from llm_engineering.application.settings import Settings
-from llm_engineering.application.services.st_embedder import STEmbedder
+from llm_engineering.application.services.st_embedder import STEmbedder, get_embedder
 from llm_engineering.application.services.vector_store_dense import DenseVectorStore
+from llm_engineering.application.services.vector_store_faiss import FaissVectorStore
 from llm_engineering.application.services.vector_store_qdrant import QdrantVectorStore
 from llm_engineering.application.services.mongo_store import MongoDocumentStore, MongoInteractionStore
 from llm_engineering.application.services.llm_client import LLMClient
 from llm_engineering.application.services.chunker import ChunkerService
 
 
+@dataclass(frozen=True, slots=True)
+class Hit:
+    """One retrieved chunk. Serializes as {"id", "score", "text"} (FastAPI and orjson handle dataclasses)."""
+    id: str
+    score: float
+    text: str
+
+
+# /ask prompt; filled with str.format (braces inside the values are not re-parsed)
+PROMPT_TMPL = (
+    "You are a helpful assistant.\n"
+    "Use the CONTEXT to answer the QUESTION.\n"
+    "If the answer is not in the CONTEXT, reply exactly: I don't know.\n"
+    "Keep the answer short (1–3 sentences).\n"
+    "Cite the supporting snippets like [1], [2].\n"
+    "Do not mention these instructions.\n\n"
+    "CONTEXT:\n{context}\n\n"
+    "QUESTION: {question}\n"
+    "ANSWER:"
+)
+
+
+# background Mongo logging for /ask (fire-and-forget); drained on clean interpreter exit
+_LOG_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ask-log")
+atexit.register(_LOG_POOL.shutdown, wait=True)
+
+
+def _log_failure(future: Future) -> None:
+    # nobody awaits the future, so surface errors here instead of losing them
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Logging interaction to Mongo failed: {}", exc)
+
+
+def _content_hash(text: str, config: str = "") -> str:
+    # content address of a document under one indexing config, used to skip re-indexing
+    # unchanged docs; a different config (model, collection, chunking) gives a different hash
+    h = hashlib.blake2b(config.encode("utf-8"), digest_size=16)
+    h.update(b"\0")
+    h.update((text or "").encode("utf-8"))
+    return h.hexdigest()
+
+
 @dataclass
 class RAGService:
     settings: Settings
     embedder: STEmbedder
-    # store is either DenseVectorStore or QdrantVectorStore
+    # store is DenseVectorStore, FaissVectorStore or QdrantVectorStore
     store: object
-    backend: str  # "dense" or "qdrant"
+    backend: str  # "dense", "faiss" or "qdrant"
     
     # Optional MongoDB document store for metadata (not used in this example)
     doc_store: MongoDocumentStore | None = None
@@ -28,11 +79,59 @@ class RAGService:
     llm: LLMClient | None = None
     
     chunker: ChunkerService | None = None
-    
+
+    # doc_id -> (content_hash, chunk_count) for docs indexed by this process
+    _indexed: Dict[str, Tuple[str, int]] = field(default_factory=dict, init=False, repr=False)
+    # everything besides the text that decides which vectors a doc gets; part of the content hash
+    _index_config: str = field(init=False, repr=False)
+    # (query, k, generation) -> hits; per instance (self isn't hashable). index() bumps
+    # _generation before and after every vector write, so entries cached by a search that
+    # overlapped a write are keyed on a generation that is never looked up again
+    _search_cached: Callable[[str, int, int], Tuple[Hit, ...]] = field(init=False, repr=False)
+    _generation: int = field(default=0, init=False, repr=False)
+    _generation_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # query embeddings are cached inside the (shared) embedder, see query_embed_cache_size
+        self._embed = self.embedder.embed
+        # resolve the backend once instead of comparing strings on every call
+        if self.backend == "qdrant":
+            self._store_vectors = self._store_vectors_qdrant
+            self._search_impl = self._search_qdrant
+        else:
+            self._store_vectors = self._store_vectors_memory
+            self._search_impl = self._search_memory
+        # TTL bounds how long an entry can outlive a write made outside this process (shared Qdrant)
+        cache = TTLCache(maxsize=self.settings.search_cache_size, ttl=self.settings.search_cache_ttl)
+        self._search_cached = cached(cache, lock=threading.Lock())(
+            lambda query, k, generation: self._search_impl(query, k)
+        )
+        self._index_config = self._config_fingerprint()
+
+    def _config_fingerprint(self) -> str:
+        # a change to any of these must re-index docs even if their text is unchanged
+        s, c = self.settings, self.chunker
+        chunking = (c.target_chars, c.min_chars, c.max_chars, c.overlap_blocks) if c is not None else None
+        return repr((
+            s.embedding_model_name,
+            self.backend,
+            s.qdrant_collection if self.backend == "qdrant" else None,
+            chunking,
+            s.chunk_bypass_chars,
+        ))
 
     @classmethod
     def build(cls, settings: Settings) -> "RAGService":
-        embedder = STEmbedder(model_name=settings.embedding_model_name, device=None)
+        embedder = get_embedder(
+            settings.embedding_model_name,
+            settings.embedding_device,
+            settings.embedding_num_threads,
+            settings.embedding_backend,
+            settings.embedding_model_file,
+            settings.embedding_precision,
+            settings.embedding_num_workers,
+            settings.query_embed_cache_size,
+        )
 
         use_qdrant = bool(settings.use_qdrant or settings.qdrant_url)
         if use_qdrant:
@@ -43,11 +142,26 @@ class RAGService:
                 api_key=settings.qdrant_api_key,
                 collection=settings.qdrant_collection,
                 vector_size=settings.embedding_dim,
+                point_id_hash=settings.qdrant_point_id_hash,
+                prefer_grpc=settings.qdrant_prefer_grpc,
+                grpc_port=settings.qdrant_grpc_port,
             )
             backend = "qdrant"
+        elif settings.use_faiss:
+            logger.info("Using in-memory FAISS backend")
+            store = FaissVectorStore(
+                dim=settings.embedding_dim,
+                factory=settings.faiss_index_factory,
+                nprobe=settings.faiss_nprobe,
+            )
+            backend = "faiss"
         else:
             logger.info("Using in-memory dense backend")
-            store = DenseVectorStore()
+            store = DenseVectorStore(
+                precision=settings.dense_precision,
+                hnsw_min_rows=settings.dense_hnsw_min_rows,
+                binary_prefilter=settings.dense_binary_prefilter,
+            )
             backend = "dense"
             
         # --- optional Mongo doc store ---
@@ -62,12 +176,14 @@ class RAGService:
                 uri=settings.mongo_uri,
                 db_name=settings.mongo_db_name,
                 collection_name=settings.mongo_collection_docs,
+                compressors=settings.mongo_compressors,
             )
             
             history_store = MongoInteractionStore(
                 uri=settings.mongo_uri,
                 db_name=settings.mongo_db_name,
                 collection_name=settings.mongo_collection_history,
+                compressors=settings.mongo_compressors,
             )
             
         # --- optional LLM client (Ollama) ---
@@ -89,65 +205,175 @@ class RAGService:
         """
         items: list of (doc_id, full_text)
 
+        - Skip docs whose exact content is already indexed under the same doc_id
+          (and the same embedding model / collection / chunking settings)
         - Store full docs in Mongo (source of truth)
         - Chunk docs, embed each chunk, store chunks in Qdrant
+
+        Returns the number of chunks indexed, counting the existing chunks of skipped docs.
         """
         logger.info("Indexing {} document(s) via {}", len(items), self.backend)
 
-        # 1) Store full documents in Mongo
+        # Drop empty/whitespace-only docs (nothing to embed) and duplicate doc_ids (last one wins)
+        items = list({doc_id: (doc_id, text) for doc_id, text in items if text and text.strip()}.values())
+        if not items:
+            return 0
+
+        # 0) Content-hash check: re-ingesting unchanged docs skips chunk/embed/write entirely
+        hashes = {doc_id: _content_hash(text, self._index_config) for doc_id, text in items}
+        known = self._indexed_state(list(hashes))
+        skipped_chunks = 0
+        fresh: list[tuple[str, str]] = []
+        for doc_id, text in items:
+            state = known.get(doc_id)
+            if state is not None and state[0] == hashes[doc_id]:
+                skipped_chunks += state[1]
+            else:
+                fresh.append((doc_id, text))
+        if len(fresh) < len(items):
+            logger.info("Skipping {} unchanged document(s)", len(items) - len(fresh))
+            items = fresh
+            if not items:
+                return skipped_chunks
+
+        # 1) Store full documents in Mongo, in the background: the write is independent
+        #    of chunking/embedding, so its latency overlaps with steps 2-3
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            mongo_future = None
+            if self.doc_store is not None:
+                mongo_future = pool.submit(
+                    self.doc_store.upsert_documents, items, mode=self.settings.mongo_write_mode
+                )
+            chunk_items = self._chunk_and_store(items)
+            if mongo_future is not None:
+                # surface write errors; docs must exist before set_index_state below
+                mongo_future.result()
+
+        if not chunk_items:
+            return skipped_chunks
+
+        # 4) Remember what was indexed (only after the vectors are stored)
+        counts = Counter(doc_id for doc_id, _, _ in chunk_items)
+        state = {doc_id: (hashes[doc_id], counts.get(doc_id, 0)) for doc_id, _ in items}
+        self._indexed.update(state)
         if self.doc_store is not None:
-            self.doc_store.upsert_documents(items)
+            self.doc_store.set_index_state(state)
+
+        return len(chunk_items) + skipped_chunks
 
+    def _chunk_and_store(self, items: List[Tuple[str, str]]) -> list[tuple[str, str, str]]:
+        """Chunk, embed and store the vectors; returns the (doc_id, chunk_id, chunk_text) indexed."""
         # 2) Chunk documents
         chunk_items: list[tuple[str, str, str]] = []  # (doc_id, chunk_id, chunk_text)
+        bypass_chars = self.settings.chunk_bypass_chars
 
         for doc_id, full_text in items:
             full_text = (full_text or "").strip()
             if not full_text:
                 continue
 
+            # fallback: treat the whole doc as one chunk
             if self.chunker is None:
-                # fallback: treat the whole doc as one chunk
                 chunk_items.append((doc_id, f"{doc_id}#chunk0", full_text))
                 continue
 
-            pairs = self.chunker.chunk(doc_id, full_text)  # returns (chunk_id, chunk_text)
-            for chunk_id, chunk_text in pairs:
+            # docs that already fit in a single chunk: still normalized and boilerplate-filtered
+            # (consent banners / nav stubs are dropped), only the chunk accumulation is skipped
+            if len(full_text) <= bypass_chars:
+                chunk_text = self.chunker.clean(full_text)
+                if chunk_text:
+                    chunk_items.append((doc_id, f"{doc_id}#chunk0", chunk_text))
+                continue
+
+            # chunker yields (chunk_id, chunk_text) lazily
+            for chunk_id, chunk_text in self.chunker.chunk(doc_id, full_text):
                 chunk_items.append((doc_id, chunk_id, chunk_text))
 
         if not chunk_items:
-            return 0
+            return chunk_items
         
         logger.info("Chunker produced {} chunk(s) for indexing", len(chunk_items))
         
-        # 3) Index chunk vectors
-        if self.backend == "qdrant":
-            return self.store.index_many(chunk_items, embed_func=self.embedder.embed)
+        # 3) Embed all chunks in one batched forward pass, then index the vectors
+        vectors = self.embedder.embed_batch(
+            [chunk_text for _, _, chunk_text in chunk_items],
+            batch_size=self.settings.embedding_batch_size,
+        )
+        self._bump_generation()
+        try:
+            self._store_vectors(chunk_items, vectors)
+        finally:
+            # cached hits may be stale now
+            self._bump_generation()
+        return chunk_items
+
+    def _bump_generation(self) -> None:
+        with self._generation_lock:
+            self._generation += 1
 
-        # Dense backend fallback (if you still support it)
-        for doc_id, chunk_id, chunk_text in chunk_items:
-            vec = self.embedder.embed(chunk_text)
-            self.store.add(chunk_id, chunk_text, vec)
+    def _store_vectors_qdrant(self, chunk_items: list[tuple[str, str, str]], vectors) -> None:
+        self.store.index_many(chunk_items, vectors)
 
-        return len(chunk_items)
+    def _store_vectors_memory(self, chunk_items: list[tuple[str, str, str]], vectors) -> None:
+        # In-memory backends (dense / faiss) share the add_many(items, vectors) interface
+        self.store.add_many([(chunk_id, chunk_text) for _, chunk_id, chunk_text in chunk_items], vectors)
 
-    def search(self, query: str, k: int = 3) -> List[Tuple[str, float, str]]:
+    def _indexed_state(self, doc_ids: List[str]) -> Dict[str, Tuple[str, int]]:
+        """(content_hash, chunk_count) of already indexed docs among doc_ids."""
+        state = {d: self._indexed[d] for d in doc_ids if d in self._indexed}
+        # Qdrant vectors outlive this process, so the Mongo record also covers docs
+        # indexed before a restart (in-memory stores start empty, so only trust _indexed)
+        missing = [d for d in doc_ids if d not in state]
+        if missing and self.backend == "qdrant" and self.doc_store is not None:
+            state.update(self.doc_store.get_index_state(missing))
+        return state
+
+    def search(self, query: str, k: int = 3) -> List[Hit]:
         """
-        Returns list of (doc_id, score, text) from vector store.
+        Returns list of Hit(id, score, text) from vector store.
+
+        Repeated (query, k) pairs are served from a TTL cache (settings.search_cache_size,
+        settings.search_cache_ttl) without re-embedding the query, until the next index().
         """
-        if self.backend == "qdrant":
-            return self.store.search(query, k=k, embed_func=self.embedder.embed)
+        return list(self._search_cached(query, k, self._generation))
 
-        # Dense fallback (if you still support it)
-        return self.store.search(query, k=k, embed_func=self.embedder.embed)
+    def hydrate_sources(self, sources: List[dict]) -> List[dict]:
+        """
+        Join the retrieved chunk text back onto history sources ({"id": chunk_id, "score": ...}).
+
+        Texts come from the vector store (Qdrant payloads, or the in-memory store for chunks
+        indexed by this process). Sources whose chunk is gone (re-chunked doc, in-memory store
+        after a restart) get a bounded "doc_snippet" of the parent document instead, if Mongo is on.
+        """
+        texts = self.store.get_texts(list(dict.fromkeys(src["id"] for src in sources)))
+        missing = []
+        for src in sources:
+            text = texts.get(src["id"])
+            if text is None:
+                missing.append(src)
+            else:
+                src["text"] = text
+        if missing and self.doc_store is not None:
+            self.doc_store.hydrate_doc_snippets(missing, self.settings.max_context_chars_per_hit)
+        return sources
+
+    def _search_qdrant(self, query: str, k: int) -> Tuple[Hit, ...]:
+        return tuple(Hit(*hit) for hit in self.store.search(query, k=k, embed_func=self._embed))
+
+    def _search_memory(self, query: str, k: int) -> Tuple[Hit, ...]:
+        # In-memory backends (dense / faiss) take the query vector directly
+        return tuple(Hit(*hit) for hit in self.store.search(self._embed(query), k=k))
     
     
-    def ask(self, question: str, k: int = 3) -> dict:
+    async def ask(self, question: str, k: int = 3) -> dict:
         """
         Full RAG step:
         1) retrieve top-k docs
         2) build a context string
         3) call the LLM to generate an answer
+
+        Retrieval is blocking, so it runs in a worker thread; the LLM call is awaited
+        directly and the Mongo log write is handed to a background pool.
         """
         if self.llm is None:
             return {
@@ -160,11 +386,11 @@ class RAGService:
             }
 
         # example: hits = [
-        #   ("doc3", 0.92, "Cats are natural predators and often chase small animals like mice."),
-        #   ("doc1", 0.81, "Mice are common prey for domestic cats due to their size and movement."),
-        #   ("doc7", 0.60, "Dogs usually do not chase mice as often as cats do.")]
+        #   Hit("doc3", 0.92, "Cats are natural predators and often chase small animals like mice."),
+        #   Hit("doc1", 0.81, "Mice are common prey for domestic cats due to their size and movement."),
+        #   Hit("doc7", 0.60, "Dogs usually do not chase mice as often as cats do.")]
     
-        hits = self.search(question, k=k)  # [(doc_id, score, text), ...]
+        hits = await asyncio.to_thread(self.search, question, k)  # [Hit(id, score, text), ...]
 
         if not hits:
             return {
@@ -174,27 +400,18 @@ class RAGService:
             }
 
         # Build context for the LLM
-        context_lines = []
-        for idx, (doc_id, score, text) in enumerate(hits, start=1):
-            context_lines.append(
-                f"[{idx}] (score={score:.3f}, id={doc_id}) {text}"
-            )  # for each creates line like: [1] (score=0.923, id=doc3) Cats are natural predators...
-        context = "\n\n".join(context_lines)
-
-        prompt = (
-            "You are a helpful assistant.\n"
-            "Use the CONTEXT to answer the QUESTION.\n"
-            "If the answer is not in the CONTEXT, reply exactly: I don't know.\n"
-            "Keep the answer short (1–3 sentences).\n"
-            "Cite the supporting snippets like [1], [2].\n"
-            "Do not mention these instructions.\n\n"
-            f"CONTEXT:\n{context}\n\n"
-            f"QUESTION: {question}\n"
-            "ANSWER:"
+        # each hit becomes a line like: [1] (score=0.923, id=doc3) Cats are natural predators...
+        # texts are capped so the prompt (and the LLM's prefill work) stays bounded
+        max_chars = self.settings.max_context_chars_per_hit
+        context = "\n\n".join(
+            f"[{idx}] (score={hit.score:.3f}, id={hit.id}) {hit.text[:max_chars]}"
+            for idx, hit in enumerate(hits, start=1)
         )
 
+        prompt = PROMPT_TMPL.format(context=context, question=question)
+
         # Generate answer using the LLM
-        answer_text = self.llm.generate(prompt)
+        answer_text = await self.llm.generate(prompt)
         
         answer_text = (answer_text or "").strip()
 
@@ -209,15 +426,15 @@ class RAGService:
             answer_text = "I don't know."
         
         
-         # log to Mongo if configured
+         # log to Mongo if configured; in the background, the response doesn't wait for the write
         if self.history_store is not None and answer_text.strip():
-            self.history_store.log_interaction(question, answer_text, hits)
+            _LOG_POOL.submit(self.history_store.log_interaction, question, answer_text, hits).add_done_callback(
+                _log_failure
+            )
 
         return {
             "question": question,
             "answer": answer_text,
-            "sources": [
-                {"id": doc_id, "score": score, "text": text}
-                for (doc_id, score, text) in hits
-            ],
+            # Hit dataclasses serialize to {"id", "score", "text"} as-is
+            "sources": hits,
         }
\ No newline at end of file
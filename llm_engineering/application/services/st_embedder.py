@@ -1,20 +1,193 @@
 from __future__ import annotations
+from functools import lru_cache
 from typing import List
+import multiprocessing
+import os
+import threading
 from loguru import logger
 
 # Sentence Transformers (uses PyTorch under the hood)
 from sentence_transformers import SentenceTransformer
+from sentence_transformers.util import batch_to_device
 import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+
+# embed_batch only starts DataLoader workers for at least this many texts (and 8 batches):
+# below that, starting the worker processes costs more than the tokenization they save
+_WORKERS_MIN_TEXTS = 2048
+# the API process is multi-threaded (uvicorn, loguru's queue thread, to_thread workers), and
+# forking it is unsafe; forkserver forks workers from a clean single-threaded server instead
+_WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class _Tokenize:
+    """
+    DataLoader collate_fn: raw strings -> padded model inputs, like SentenceTransformer.tokenize().
+
+    Holds only the (picklable) tokenizer, so starting a worker doesn't pickle the model.
+    """
+    def __init__(self, tokenizer, max_length: int | None):
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+
+    def __call__(self, texts: List[str]) -> dict:
+        return self.tokenizer(
+            [t.strip() for t in texts],
+            padding=True,
+            truncation="longest_first",
+            return_tensors="pt",
+            max_length=self.max_length,
+        )
+
+
+# set by the first _configure_torch_threads call; later embedders leave the settings alone
+_torch_threads_configured = False
+_torch_threads_lock = threading.Lock()
+
+
+def _configure_torch_threads(num_threads: int | None, cpu: bool) -> None:
+    # process-wide torch settings: applied once, by the first embedder
+    # (whatever num_threads / device later embedders ask for)
+    global _torch_threads_configured
+    with _torch_threads_lock:
+        if _torch_threads_configured:
+            return
+        _torch_threads_configured = True
+    torch.set_num_threads(num_threads or min(os.cpu_count() or 1, 16))
+    if cpu:
+        # one encode() at a time -> no use for a second (inter-op) pool
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # only allowed before torch starts any inter-op work
+            logger.debug("torch inter-op threads already fixed; leaving as is")
 
 
 class STEmbedder:
     """Thin wrapper around SentenceTransformer to embed text → np.ndarray."""
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", device: str | None = None):
-        logger.info("Loading sentence-transformer model: {}", model_name)
-        self.model = SentenceTransformer(model_name, device=device)
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        device: str | None = None,
+        num_threads: int | None = None,  # None -> min(cpu_count, 16)
+        backend: str = "torch",  # "torch", "onnx" or "openvino"
+        model_file: str | None = None,  # e.g. "onnx/model_O4.onnx"; None -> the backend's default export
+        precision: str = "fp32",  # "fp32", "fp16" or "bf16" (half precisions: torch on CUDA only)
+        num_workers: int = 0,  # >0: embed_batch tokenizes in DataLoader worker processes (torch backend)
+        cache_size: int = 0,  # >0: LRU of embed() results by text (repeat queries skip tokenize + forward)
+    ):
+        _configure_torch_threads(num_threads, device in (None, "cpu"))
+        logger.info("Loading sentence-transformer model: {} (backend={})", model_name, backend)
+        if backend == "torch":
+            self.model = SentenceTransformer(model_name, device=device)
+        else:
+            # same tokenizer/pooling, forward pass runs on ONNX Runtime / OpenVINO fused kernels
+            model_kwargs: dict = {}
+            if model_file:
+                model_kwargs["file_name"] = model_file
+            if backend == "onnx":
+                model_kwargs["provider"] = (
+                    "CUDAExecutionProvider" if (device or "").startswith("cuda") else "CPUExecutionProvider"
+                )
+            self.model = SentenceTransformer(model_name, device=device, backend=backend, model_kwargs=model_kwargs)
+        self.model.eval()
+        self.num_workers = num_workers if backend == "torch" else 0
+        if cache_size > 0:
+            # text -> vector bytes (immutable, so safe to hand out from a shared cache);
+            # the instance attribute shadows embed() for this embedder only
+            self._embed_cached = lru_cache(maxsize=cache_size)(self._embed_bytes)
+            self.embed = self._embed_from_cache
+
+        if precision != "fp32":
+            if backend == "torch" and (device or "").startswith("cuda"):
+                # half the memory traffic, tensor cores; outputs are cast back to float32 below
+                self.model = self.model.half() if precision == "fp16" else self.model.to(torch.bfloat16)
+            else:
+                logger.warning("precision={} needs backend=torch on a CUDA device; keeping fp32", precision)
 
     def embed(self, text: str) -> np.ndarray:
-        # Returns shape (d,)
-        vec = self.model.encode(text, normalize_embeddings=True)  # cosine-ready
+        # Returns shape (d,); inference_mode skips autograd bookkeeping entirely
+        with torch.inference_mode():
+            vec = self.model.encode(
+                text,
+                normalize_embeddings=True,  # cosine-ready
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
         # ensure 1D np.ndarray float32
         return np.asarray(vec, dtype=np.float32).reshape(-1)
+
+    def _embed_bytes(self, text: str) -> bytes:
+        return STEmbedder.embed(self, text).tobytes()
+
+    def _embed_from_cache(self, text: str) -> np.ndarray:
+        # read-only float32 view over the cached bytes
+        return np.frombuffer(self._embed_cached(text), dtype=np.float32)
+
+    def embed_batch(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        # Returns shape (N, d); one encode() call so the model runs on full batches
+        # (sentence-transformers sorts by length internally, so each batch pads little)
+        if self.num_workers > 0 and len(texts) >= max(_WORKERS_MIN_TEXTS, 8 * batch_size):
+            return self._embed_batch_workers(texts, batch_size)
+        with torch.inference_mode():
+            vecs = self.model.encode(
+                texts,
+                batch_size=batch_size,
+                normalize_embeddings=True,  # cosine-ready
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return np.asarray(vecs, dtype=np.float32).reshape(len(texts), -1)
+
+    def _embed_batch_workers(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """
+        embed_batch() with tokenization in `num_workers` DataLoader processes.
+
+        On CPU, tokenizing a batch can cost as much as its forward pass; the workers
+        tokenize the next batches (outside this process's GIL) while the model runs.
+        Same length sorting, pooling and normalization as encode(). Workers are started
+        via forkserver (spawn where unavailable), never forked from this process.
+        """
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        loader = DataLoader(
+            [texts[i] for i in order],  # a list is a map-style dataset of raw strings
+            batch_size=batch_size,
+            num_workers=self.num_workers,
+            collate_fn=_Tokenize(self.model.tokenizer, self.model.max_seq_length),
+            multiprocessing_context=_WORKER_START_METHOD,
+        )
+        out = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        pos = 0
+        with torch.inference_mode():
+            for features in loader:
+                emb = self.model(batch_to_device(features, self.model.device))["sentence_embedding"]
+                emb = torch.nn.functional.normalize(emb.float(), p=2, dim=1)
+                out[order[pos:pos + emb.shape[0]]] = emb.cpu().numpy()
+                pos += emb.shape[0]
+        return out
+
+
+@lru_cache(maxsize=4)
+def get_embedder(
+    model_name: str,
+    device: str | None = None,
+    num_threads: int | None = None,
+    backend: str = "torch",
+    model_file: str | None = None,
+    precision: str = "fp32",
+    num_workers: int = 0,
+    cache_size: int = 0,
+) -> STEmbedder:
+    """One STEmbedder per (model_name, device, backend) per process, so weights are loaded once."""
+    return STEmbedder(
+        model_name=model_name,
+        device=device,
+        num_threads=num_threads,
+        backend=backend,
+        model_file=model_file,
+        precision=precision,
+        num_workers=num_workers,
+        cache_size=cache_size,
+    )
@@ -2,63 +2,127 @@ from __future__ import annotations
 from typing import Dict, List, Tuple
 import math
 
-
-def _cosine_sim(a: Dict[str, float], b: Dict[str, float]) -> float:
-    # cosine = dot(a,b) / (||a|| * ||b||) for sparse dicts
-    if not a or not b:
-        return 0.0
-    dot = 0.0
-    for term, va in a.items():
-        vb = b.get(term)
-        if vb is not None:
-            dot += va * vb
-    na = math.sqrt(sum(v * v for v in a.values()))
-    nb = math.sqrt(sum(v * v for v in b.values()))
-    if na == 0.0 or nb == 0.0:
-        return 0.0
-    return dot / (na * nb)
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
 
 
 class InMemoryVectorStore:
-    """Stores (id, text, vector) in memory. Not persistent; great for learning."""
+    """Stores (id, text, vector) in memory. Not persistent; great for learning.
+
+    TF vectors are mapped onto a shared vocabulary (term -> column) and kept as
+    L2-normalized sparse rows, so search is one sparse matrix x dense vector product.
+    """
 
     def __init__(self, embedder):
         self.embedder = embedder
-        #_docs is a dictionary that maps document IDs to a tuple containing the raw text and its corresponding term-frequency vector.
-        self._docs: Dict[str, Tuple[str, Dict[str, float]]] = {}
-        # id -> (raw_text, tf_vector)
+        # term -> column index
+        self._vocab: Dict[str, int] = {}
+        # row i holds doc _ids[i] / _texts[i]; _pos maps doc_id -> row
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._pos: Dict[str, int] = {}
+        # per-row (column indices, L2-normalized weights)
+        self._rows: List[Tuple[np.ndarray, np.ndarray]] = []
+        # (N, |V|) CSR built lazily from _rows; None after a row was replaced,
+        # fewer rows than _rows after appends
+        self._matrix: csr_matrix | None = None
+
+    def _to_row(self, vec: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        # {"cats": 1.0, "chase": 1.0} -> (array([0, 1]), array([0.707, 0.707]))
+        vocab = self._vocab
+        indices = np.fromiter((vocab.setdefault(t, len(vocab)) for t in vec), dtype=np.int32, count=len(vec))
+        data = np.fromiter(vec.values(), dtype=np.float32, count=len(vec))
+        norm = float(np.linalg.norm(data))
+        if norm > 0.0:
+            data /= norm
+        return indices, data
 
     def add(self, doc_id: str, text: str) -> None:
         # Example: doc_id="doc1", text="This is a test.
-        
+
         # store.add("d1", "Cats chase mice.")
-        # _docs = {"d1": ("Cats chase mice.", {"cats":1.0,"chase":1.0,"mice":1.0})
-        vec = self.embedder.embed(text)
-        self._docs[doc_id] = (text, vec)
+        # row for "d1" = {"cats":1.0,"chase":1.0,"mice":1.0} mapped to vocab columns and normalized
+        self._put(doc_id, text, self._to_row(self.embedder.embed(text)))
+
+    def _put(self, doc_id: str, text: str, row: Tuple[np.ndarray, np.ndarray]) -> None:
+        pos = self._pos.get(doc_id)
+        if pos is None:
+            # appended rows are stacked onto the cached matrix by _csr()
+            self._pos[doc_id] = len(self._ids)
+            self._ids.append(doc_id)
+            self._texts.append(text)
+            self._rows.append(row)
+        else:
+            # re-adding an id replaces it in place
+            self._texts[pos] = text
+            self._rows[pos] = row
+            self._matrix = None
 
     def add_many(self, items: List[Tuple[str, str]]) -> None:
-        
+
         # items = [("doc1", "This is a test."), ("doc2", "Another document.")]
         # store.add_many(items)
-        # _docs = {"doc1": ("This is a test.", {...}), "doc2": ("Another document.", {...})}
-        
-        for doc_id, text in items:
-            self.add(doc_id, text)
+
+        if not items:
+            return
+        # one tokenize pass per text straight into CSR arrays (no per-doc dicts)
+        batch = self.embedder.embed_batch([text for _, text in items], self._vocab)
+        indptr, indices, data = batch.indptr, batch.indices, batch.data
+        for i, (doc_id, text) in enumerate(items):
+            a, b = indptr[i], indptr[i + 1]
+            self._put(doc_id, text, (indices[a:b], data[a:b]))
+
+    def _rows_csr(self, rows: List[Tuple[np.ndarray, np.ndarray]]) -> csr_matrix:
+        # (len(rows), |V|) CSR from per-row (indices, data)
+        lengths = np.fromiter((len(ix) for ix, _ in rows), dtype=np.int64, count=len(rows))
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.concatenate([ix for ix, _ in rows]) if rows else np.zeros(0, dtype=np.int32)
+        data = np.concatenate([d for _, d in rows]) if rows else np.zeros(0, dtype=np.float32)
+        return csr_matrix((data, indices, indptr), shape=(len(rows), len(self._vocab)))
+
+    def _csr(self) -> csr_matrix:
+        # full rebuild after a replace; after appends only the new rows are converted
+        # and stacked below the cached matrix (vocab growth = new empty columns)
+        matrix = self._matrix
+        if matrix is None:
+            matrix = self._rows_csr(self._rows)
+        elif matrix.shape[0] < len(self._rows) or matrix.shape[1] < len(self._vocab):
+            matrix.resize((matrix.shape[0], len(self._vocab)))
+            matrix = vstack([matrix, self._rows_csr(self._rows[matrix.shape[0]:])], format="csr")
+        self._matrix = matrix
+        return matrix
 
     def search(self, query: str, k: int = 5) -> List[Tuple[str, float, str]]:  # 3-element tuple
         # Example: query="test", k=3
+        if not self._ids or k <= 0:
+            return []
+
         qv = self.embedder.embed(query)
-        
-        # scored = [ ("doc_id", cosine_score, "raw_text"), ...]
-
-        scored: List[Tuple[str, float, str]] = []
-        for doc_id, (raw, vec) in self._docs.items():
-            score = _cosine_sim(qv, vec)
-            
-            # scored = [("d1", 0.70, "Cats chase mice"), ("d2", 0.00, "Dogs like bones"), ("d3", 0.98, "A cat likes to chase") ]
-            scored.append((doc_id, score, raw))
-            
-        
-        # sort by score desc
-        scored.sort(key=lambda x: x[1], reverse=True)
-        return scored[:k]
+        matrix = self._csr()
+
+        # dense query over the vocabulary; terms unseen in the corpus can't match,
+        # but still count towards the query norm so scores stay true cosine values.
+        # Rows are stored pre-normalized, so the only norm per search is the query's:
+        # one sqrt, folded into the few nonzero query weights (not the |V|-wide vector)
+        qnorm = math.sqrt(sum(w * w for w in qv.values()))
+        inv_qnorm = 1.0 / qnorm if qnorm > 0.0 else 0.0
+        q = np.zeros(matrix.shape[1], dtype=np.float32)
+        vocab = self._vocab
+        for term, w in qv.items():
+            col = vocab.get(term)
+            if col is not None:
+                q[col] = w * inv_qnorm
+
+        # scores[i] = cosine(query, doc i)
+        scores = matrix @ q
+
+        # top-k without sorting all N scores: O(N) partition (on the scores themselves,
+        # no negated N-length copy), then sort only the k winners
+        if k < len(scores):
+            top = np.argpartition(scores, len(scores) - k)[-k:]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+
+        return [(self._ids[i], float(scores[i]), self._texts[i]) for i in top]
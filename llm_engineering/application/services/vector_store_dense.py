@@ -1,31 +1,274 @@
 from __future__ import annotations
 from typing import Dict, List, Tuple
+import threading
 import numpy as np
 
+import faiss
 
-def _cosine(a: np.ndarray, b: np.ndarray) -> float:
-    # Both expected normalized; still handle edge cases.
-    if a.size == 0 or b.size == 0:
-        return 0.0
-    denom = np.linalg.norm(a) * np.linalg.norm(b)
-    if denom == 0.0:
-        return 0.0
-    return float(np.dot(a, b) / denom)
+# int8 codes: component / scale[dim] * 127, scale = per-dim max |component|
+_INT8_SCALE = 127.0
+# int8 rows are staged as float32 until the store holds this many, then the per-dim
+# scales are calibrated on all of them and the matrix is quantized once
+_INT8_MIN_CALIBRATION_ROWS = 32
+
+# rows scored per matmul on the int8 path (bounds the float32 upcast copy)
+_INT8_BLOCK_ROWS = 65536
+
+# binary prefilter keeps this many candidates per requested hit for the exact rescoring
+_PREFILTER_OVERSAMPLE = 10
+
+# HNSW graph parameters: neighbours per node, build-time and query-time beam width
+_HNSW_M = 32
+_HNSW_EF_CONSTRUCTION = 100
+_HNSW_EF_SEARCH = 64
+
+
+def _normalized(vec: np.ndarray) -> np.ndarray:
+    # float32 (d,), unit length; zero vectors stay zero (cosine 0 with everything)
+    v = np.asarray(vec, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm > 0.0 else v
+
+
+def _grown(buf: np.ndarray | None, n: int, width: int, dtype) -> np.ndarray:
+    # row buffer with room for row n: allocate, or double when full
+    if buf is None:
+        return np.empty((16, width), dtype=dtype)
+    if n == buf.shape[0]:
+        grown = np.empty((2 * n, width), dtype=dtype)
+        grown[:n] = buf
+        return grown
+    return buf
+
+
+def _quantize(vecs: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    # (..., d) float -> int8 codes; clip covers components beyond the calibrated range
+    return np.clip(np.rint(vecs / scale * _INT8_SCALE), -127, 127).astype(np.int8)
 
 
 class DenseVectorStore:
-    """Stores dense vectors in memory. Not persistent; ideal for learning."""
-    def __init__(self):
-        # id -> (raw_text, vector)
-        self._docs: Dict[str, Tuple[str, np.ndarray]] = {}
+    """
+    Stores dense vectors in memory. Not persistent; ideal for learning.
+
+    Vectors are L2-normalized on insert and kept as rows of one contiguous (N, d)
+    matrix, so search is a single matrix-vector product (cosine == dot product).
+
+    precision="int8" keeps each row as int8 codes: 4x less memory than float32,
+    scores are cosine up to quantization error. Each dimension gets its own scale
+    (max |component| over the first 32 rows, which are kept as float32 until then),
+    so the 255 levels cover the range embeddings actually use rather than [-1, 1].
+
+    With float32 rows and at least `hnsw_min_rows` vectors, search goes through a
+    FAISS HNSW graph (~O(log N) per query) instead of the exact scan. It is approximate:
+    expect recall@10 around 0.98, i.e. now and then a true top-k chunk is missed.
+    Off by default (0); below ~1000 rows the exact scan is cheaper than the graph anyway.
+    Replacing a row appends its new vector as a fresh graph node and tombstones the old
+    one (filtered out during the graph search); the graph is only rebuilt once more than
+    half of its nodes are tombstones.
+
+    binary_prefilter=True speeds up the exact scan: each row's sign bits are kept
+    packed (d/8 bytes), candidates are picked by Hamming distance to the query's
+    sign bits (XOR + popcount), and only 10*k of them are rescored exactly.
+    """
+    def __init__(self, precision: str = "float32", hnsw_min_rows: int = 0, binary_prefilter: bool = False):
+        if precision not in ("float32", "int8"):
+            raise ValueError(f"Unsupported precision: {precision!r}")
+        self.precision = precision
+        self.hnsw_min_rows = hnsw_min_rows
+        self.binary_prefilter = binary_prefilter
+        # row i holds _ids[i] / _texts[i]; _pos maps doc_id -> row
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._pos: Dict[str, int] = {}
+        # (capacity, d) buffer, allocated on the first add and doubled when full;
+        # only the first len(_ids) rows are live
+        self._matrix: np.ndarray | None = None
+        # (capacity, ceil(d/8)) packed sign bits per row, for binary_prefilter
+        self._bits: np.ndarray | None = None
+        # HNSW over the rows, built lazily by search. Graph nodes (faiss labels) map to rows
+        # through _graph_rows; _row_label is the reverse for rows already in the graph.
+        # HNSW can't update or delete nodes, so a replaced row (_replaced) gets a new node
+        # on the next search and its old label goes to _dead (excluded via an IDSelector).
+        self._hnsw: faiss.IndexHNSWFlat | None = None
+        self._graph_rows: List[int] = []
+        self._row_label: List[int] = []
+        self._replaced: set[int] = set()
+        self._dead: set[int] = set()
+        # SearchParametersHNSW filtering _dead (+ the selectors it points to); None when stale
+        self._dead_filter: tuple | None = None
+        # graph updates and graph searches (worker threads) are serialized: HNSW isn't
+        # safe to search while nodes are being added
+        self._hnsw_lock = threading.Lock()
+        # int8 only: per-dim scale, fixed once _INT8_MIN_CALIBRATION_ROWS rows exist;
+        # None while rows are still staged as float32
+        self._scale: np.ndarray | None = None
+
+    def _maybe_calibrate(self) -> None:
+        # int8: once enough float32 rows are staged, fix the per-dim scales on all of
+        # them and quantize the matrix in place of the staged rows
+        n = len(self._ids)
+        if self.precision != "int8" or self._scale is not None or n < _INT8_MIN_CALIBRATION_ROWS:
+            return
+        live = self._matrix[:n]
+        scale = np.abs(live).max(axis=0)
+        scale[scale == 0.0] = 1.0  # unused dimension
+        self._scale = scale.astype(np.float32)
+        codes = np.empty(self._matrix.shape, dtype=np.int8)
+        codes[:n] = _quantize(live, self._scale)
+        self._matrix = codes
+        if self.binary_prefilter:
+            # signs of the codes (components that round to 0 lose their bit)
+            self._bits[:n] = np.packbits(codes[:n] > 0, axis=1)
+
+    def _rows(self, vectors: np.ndarray) -> np.ndarray:
+        # (n, d) -> normalized float32 rows, or their int8 codes
+        rows = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0  # zero vectors stay zero
+        rows = rows / norms
+        if self.precision == "float32" or self._scale is None:
+            return rows
+        return _quantize(rows, self._scale)
 
     def add(self, doc_id: str, text: str, vector: np.ndarray) -> None:
-        self._docs[doc_id] = (text, vector)
+        self._put(doc_id, text, self._rows(np.asarray(vector).reshape(1, -1))[0])
+        self._maybe_calibrate()
+
+    def add_many(self, items: List[Tuple[str, str]], vectors: np.ndarray) -> None:
+        """items: [(doc_id, text), ...], vectors: (N, d); normalized/quantized in one pass."""
+        if not items:
+            return
+        for (doc_id, text), row in zip(items, self._rows(vectors)):
+            self._put(doc_id, text, row)
+        self._maybe_calibrate()
+
+    def _put(self, doc_id: str, text: str, row: np.ndarray) -> None:
+        pos = self._pos.get(doc_id)
+        if pos is not None:
+            # re-adding an id replaces it in place
+            self._texts[pos] = text
+            self._matrix[pos] = row
+            if self.binary_prefilter:
+                self._bits[pos] = np.packbits(row > 0)
+            if pos < len(self._row_label):
+                with self._hnsw_lock:
+                    self._replaced.add(pos)
+            return
+
+        n = len(self._ids)
+        self._matrix = _grown(self._matrix, n, row.shape[0], row.dtype)
+        self._matrix[n] = row
+        if self.binary_prefilter:
+            bits = np.packbits(row > 0)
+            self._bits = _grown(self._bits, n, bits.shape[0], np.uint8)
+            self._bits[n] = bits
+        self._pos[doc_id] = n
+        self._ids.append(doc_id)
+        self._texts.append(text)
+
+    def get_texts(self, doc_ids: List[str]) -> Dict[str, str]:
+        """Stored text of the given ids; unknown ids are left out."""
+        pos = self._pos
+        return {d: self._texts[pos[d]] for d in doc_ids if d in pos}
+
+    def _scores(self, q: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        # scores[i] = cosine(query, row i) for all live rows, or for the given row numbers
+        live = self._matrix[:len(self._ids)] if rows is None else self._matrix[rows]
+        if live.dtype == np.float32:
+            # float32 store, or int8 rows still staged before calibration
+            return live @ q
+        # int8 rows: row ~= codes * scale / 127, so fold the scale into the query once
+        # and dot the (upcast, block by block) codes with the float query
+        qs = q * (self._scale / _INT8_SCALE)
+        scores = np.empty(live.shape[0], dtype=np.float32)
+        for start in range(0, live.shape[0], _INT8_BLOCK_ROWS):
+            block = live[start:start + _INT8_BLOCK_ROWS]
+            scores[start:start + block.shape[0]] = block.astype(np.float32) @ qs
+        return scores
+
+    def _graph(self) -> faiss.IndexHNSWFlat:
+        # build on first use, then only add rows appended / replaced since the last search.
+        # Caller holds _hnsw_lock.
+        n = len(self._ids)
+        index = self._hnsw
+        if index is None or 2 * (len(self._dead) + len(self._replaced)) > index.ntotal:
+            # first build, or mostly tombstones: start over from the current rows
+            index = faiss.IndexHNSWFlat(self._matrix.shape[1], _HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = _HNSW_EF_CONSTRUCTION
+            self._hnsw = index
+            self._graph_rows, self._row_label = [], []
+            self._replaced, self._dead = set(), set()
+            self._dead_filter = None
+
+        if self._replaced:
+            rows = sorted(self._replaced)
+            self._replaced = set()
+            start = index.ntotal
+            index.add(np.ascontiguousarray(self._matrix[rows]))
+            for label, row in enumerate(rows, start):
+                self._dead.add(self._row_label[row])
+                self._row_label[row] = label
+                self._graph_rows.append(row)
+            self._dead_filter = None
+
+        done = len(self._row_label)
+        if done < n:
+            start = index.ntotal
+            index.add(np.ascontiguousarray(self._matrix[done:n]))
+            self._graph_rows.extend(range(done, n))
+            self._row_label.extend(range(start, start + n - done))
+        return index
+
+    def _search_params(self, k: int) -> faiss.SearchParametersHNSW:
+        # efSearch per call; tombstoned labels are skipped inside the graph search
+        if self._dead_filter is None:
+            params = faiss.SearchParametersHNSW()
+            keep = ()
+            if self._dead:
+                dead = faiss.IDSelectorBatch(np.fromiter(self._dead, dtype=np.int64, count=len(self._dead)))
+                alive = faiss.IDSelectorNot(dead)
+                params.sel = alive
+                keep = (dead, alive)  # params.sel doesn't own the selectors
+            self._dead_filter = (params, keep)
+        params = self._dead_filter[0]
+        params.efSearch = max(_HNSW_EF_SEARCH, k)
+        return params
+
+    def _search_hnsw(self, q: np.ndarray, k: int) -> List[Tuple[str, float, str]]:
+        with self._hnsw_lock:
+            index = self._graph()
+            live = index.ntotal - len(self._dead)
+            scores, labels = index.search(q.reshape(1, -1), min(k, live), params=self._search_params(k))
+            rows = [self._graph_rows[label] for label in labels[0] if label >= 0]  # fewer than k reachable
+        return [(self._ids[i], float(score), self._texts[i]) for score, i in zip(scores[0], rows)]
 
     def search(self, query_vec: np.ndarray, k: int = 5) -> List[Tuple[str, float, str]]:
-        results: List[Tuple[str, float, str]] = []
-        for doc_id, (raw, vec) in self._docs.items():
-            score = _cosine(query_vec, vec)
-            results.append((doc_id, score, raw))
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results[:k]
+        if not self._ids or k <= 0:
+            return []
+        q = _normalized(query_vec)
+        if self.precision == "float32" and 0 < self.hnsw_min_rows <= len(self._ids):
+            return self._search_hnsw(q, k)
+
+        n = len(self._ids)
+        candidates = None
+        if self.binary_prefilter and k * _PREFILTER_OVERSAMPLE < n:
+            candidates = self._prefilter(q, k * _PREFILTER_OVERSAMPLE)
+        scores = self._scores(q, candidates)
+
+        # top-k without sorting all N scores: O(N) partition (on the scores themselves,
+        # no negated N-length copy), then sort only the k winners
+        if k < len(scores):
+            top = np.argpartition(scores, len(scores) - k)[-k:]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        rows = top if candidates is None else candidates[top]
+
+        return [(self._ids[i], float(s), self._texts[i]) for i, s in zip(rows, scores[top])]
+
+    def _prefilter(self, q: np.ndarray, m: int) -> np.ndarray:
+        # row numbers of the m rows whose sign bits are closest (Hamming) to the query's
+        qbits = np.packbits(q > 0)
+        ham = np.bitwise_count(self._bits[:len(self._ids)] ^ qbits).sum(axis=1, dtype=np.int32)
+        # sorted so the rescored rows keep insertion order (stable tie-breaking)
+        return np.sort(np.argpartition(ham, m - 1)[:m])
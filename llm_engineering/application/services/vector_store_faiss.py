@@ -0,0 +1,126 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple
+import numpy as np
+
+import faiss
+
+
+# IVF training wants ~39 points per centroid (below that FAISS warns and k-means degrades)
+_IVF_TRAIN_POINTS_PER_LIST = 39
+
+
+class FaissVectorStore:
+    """
+    Stores dense vectors in a FAISS inner-product index. Not persistent.
+
+    Vectors are L2-normalized on insert, so inner product == cosine.
+    Same interface as DenseVectorStore: add(doc_id, text, vector) / add_many(items, vectors) / search(query_vec, k).
+
+    factory="Flat" is exact search. Any other FAISS index_factory string, e.g. "IVF256,Flat"
+    or "IVF256,PQ48x8" (~48 bytes/vector), gives an approximate index that only scans the
+    `nprobe` closest inverted lists per query. IVF needs training, so vectors go to an exact
+    flat index first; once there are 39 per centroid (nlist, or 256 per PQ codebook) the IVF
+    index is trained on them and takes over.
+    """
+    def __init__(self, dim: int, factory: str = "Flat", nprobe: int = 8):
+        self.dim = dim
+        self.factory = factory
+        self.nprobe = nprobe
+        # exact search; IDMap2 lets us use our own int64 ids (and remove them on re-add)
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        # untrained target index while self.index is still the flat staging index
+        self._pending: faiss.Index | None = None
+        self._train_min_rows = 0
+        if factory != "Flat":
+            self._pending = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+            try:
+                ivf = faiss.downcast_index(faiss.extract_index_ivf(self._pending))
+            except RuntimeError:
+                # re-adding a doc_id needs remove_ids, which graph indexes (HNSW) don't support
+                raise ValueError(f"Unsupported FAISS factory (need 'Flat' or an IVF index): {factory!r}")
+            # PQ codebooks are k-means too: 2**nbits centroids per sub-quantizer
+            centroids = max(ivf.nlist, 1 << ivf.pq.nbits) if isinstance(ivf, faiss.IndexIVFPQ) else ivf.nlist
+            self._train_min_rows = _IVF_TRAIN_POINTS_PER_LIST * centroids
+        # doc_id -> faiss id, faiss id -> (doc_id, raw_text)
+        self._ids: Dict[str, int] = {}
+        self._docs: Dict[int, Tuple[str, str]] = {}
+        self._next_id = 0
+
+    def _maybe_train(self) -> None:
+        # move the staged vectors into the trained target index once there are enough of them
+        target = self._pending
+        if target is None:
+            return
+        if self.index.ntotal < self._train_min_rows:
+            return
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        fids = faiss.vector_to_array(self.index.id_map).astype(np.int64)
+        target.train(vectors)
+        faiss.extract_index_ivf(target).nprobe = self.nprobe
+        # IVF indexes take our ids (and remove_ids) natively; an IDMap wrapper can't remove from them
+        target.add_with_ids(vectors, fids)
+        self.index = target
+        self._pending = None
+
+    @staticmethod
+    def _as_matrix(vector: np.ndarray) -> np.ndarray:
+        # (d,) -> contiguous float32 (1, d), L2-normalized
+        mat = np.array(vector, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(mat)
+        return mat
+
+    def add(self, doc_id: str, text: str, vector: np.ndarray) -> None:
+        old = self._ids.get(doc_id)
+        if old is not None:
+            # re-adding an id replaces the old vector
+            self.index.remove_ids(np.array([old], dtype=np.int64))
+            del self._docs[old]
+
+        fid = self._next_id
+        self._next_id += 1
+        self.index.add_with_ids(self._as_matrix(vector), np.array([fid], dtype=np.int64))
+        self._ids[doc_id] = fid
+        self._docs[fid] = (doc_id, text)
+        self._maybe_train()
+
+    def add_many(self, items: List[Tuple[str, str]], vectors: np.ndarray) -> None:
+        """items: [(doc_id, text), ...], vectors: (N, d); one remove + one add call."""
+        if not items:
+            return
+        # a doc_id repeated within the batch: last one wins
+        last = {doc_id: i for i, (doc_id, _) in enumerate(items)}
+        rows = sorted(last.values())
+
+        old = [self._ids[items[i][0]] for i in rows if items[i][0] in self._ids]
+        if old:
+            self.index.remove_ids(np.array(old, dtype=np.int64))
+            for fid in old:
+                del self._docs[fid]
+
+        mat = np.array(np.asarray(vectors, dtype=np.float32)[rows], dtype=np.float32).reshape(len(rows), -1)
+        faiss.normalize_L2(mat)
+        fids = np.arange(self._next_id, self._next_id + len(rows), dtype=np.int64)
+        self._next_id += len(rows)
+        self.index.add_with_ids(mat, fids)
+        for fid, i in zip(fids.tolist(), rows):
+            doc_id, text = items[i]
+            self._ids[doc_id] = fid
+            self._docs[fid] = (doc_id, text)
+        self._maybe_train()
+
+    def get_texts(self, doc_ids: List[str]) -> Dict[str, str]:
+        """Stored text of the given ids; unknown ids are left out."""
+        return {d: self._docs[self._ids[d]][1] for d in doc_ids if d in self._ids}
+
+    def search(self, query_vec: np.ndarray, k: int = 5) -> List[Tuple[str, float, str]]:
+        if self.index.ntotal == 0 or k <= 0:
+            return []
+        scores, ids = self.index.search(self._as_matrix(query_vec), min(k, self.index.ntotal))
+
+        results: List[Tuple[str, float, str]] = []
+        for score, fid in zip(scores[0], ids[0]):
+            if fid < 0:  # fewer than k hits
+                continue
+            doc_id, raw = self._docs[int(fid)]
+            results.append((doc_id, float(score), raw))
+        return results
@@ -1,7 +1,8 @@
 from __future__ import annotations
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from loguru import logger
 import numpy as np
+import hashlib
 import uuid
 
 from qdrant_client import QdrantClient
@@ -9,20 +10,40 @@ from qdrant_client.http import models as rest
 
 
 class QdrantVectorStore:
-    def __init__(self, url: str | None, api_key: str | None, collection: str, vector_size: int):
+    # points per upsert request
+    UPSERT_BATCH_SIZE = 256
+
+    def __init__(
+        self,
+        url: str | None,
+        api_key: str | None,
+        collection: str,
+        vector_size: int,
+        point_id_hash: str = "blake2b",  # "uuid5" reproduces ids of collections indexed before the switch
+        prefer_grpc: bool = True,
+        grpc_port: int = 6334,
+    ):
+        if point_id_hash not in ("blake2b", "uuid5"):
+            raise ValueError(f"Unsupported point_id_hash: {point_id_hash!r}")
         self.collection = collection
+        self.point_id_hash = point_id_hash
         url_str = str(url) if url is not None else None
 
-        self.client = QdrantClient(url=url_str, api_key=api_key)
+        # gRPC sends vectors/payloads as protobuf instead of REST JSON (no json encode/decode of
+        # chunk texts); grpc_port is used with the host from `url`
+        self.client = QdrantClient(url=url_str, api_key=api_key, prefer_grpc=prefer_grpc, grpc_port=grpc_port)
         self._ensure_collection(vector_size)
         
     def _point_id(self, doc_id: str, chunk_id: str) -> str:
         """
         Deterministically map (doc_id, chunk_id) to a UUID string.
         Same chunk -> same ID every time.
+        blake2b-128 of the key is cheaper than uuid5 (SHA-1 over namespace + key).
         """
         key = f"{doc_id}:{chunk_id}"
-        return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+        if self.point_id_hash == "uuid5":
+            return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+        return str(uuid.UUID(bytes=hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()))
 
     def _ensure_collection(self, dim: int) -> None:
         existing = [c.name for c in self.client.get_collections().collections]
@@ -35,50 +56,72 @@ class QdrantVectorStore:
             vectors_config=rest.VectorParams(size=dim, distance=rest.Distance.COSINE),
         )
 
-    def index_many(self, items: List[Tuple[str, str, str]], embed_func) -> int:
+    def index_many(self, items: List[Tuple[str, str, str]], vectors: np.ndarray) -> int:
         """
         items: list of (doc_id, chunk_id, text).
+        vectors: (N, d) embeddings of the item texts, precomputed in one batch.
         - Use deterministic UUIDs for Qdrant point IDs.
         - Store doc_id, chunk_id, and text in payload.
+        - The (N, d) array goes to upload_collection as-is: the client slices it into
+          UPSERT_BATCH_SIZE requests and converts each slice for the wire (protobuf
+          floats straight from the array when using gRPC) - no per-vector lists here.
+        - All but the last slice are sent with wait=False so Qdrant indexes one slice
+          while the next is being sent; the last one waits, so index_many returns once
+          the points are applied.
         """
-        ids = []
-        vectors = []
-        payloads = []
-
-        for doc_id, chunk_id, text in items:
-            vec = embed_func(text)
-            if isinstance(vec, np.ndarray):
-                vec = vec.astype("float32").tolist()
+        n = len(items)
+        if n == 0:
+            return 0
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = [self._point_id(doc_id, chunk_id) for doc_id, chunk_id, _ in items]
+        payloads = [{"doc_id": doc_id, "chunk_id": chunk_id, "text": text} for doc_id, chunk_id, text in items]
 
-            point_id = self._point_id(doc_id, chunk_id)  # deterministic UUID
-
-            ids.append(point_id)
-            vectors.append(vec)
-            payloads.append(
-                {
-                    "doc_id": doc_id,
-                    "chunk_id": chunk_id,
-                    "text": text,
-                }
+        last = (n - 1) // self.UPSERT_BATCH_SIZE * self.UPSERT_BATCH_SIZE  # start of the last slice
+        for lo, hi, wait in ((0, last, False), (last, n, True)):
+            if lo == hi:
+                continue
+            self.client.upload_collection(
+                collection_name=self.collection,
+                vectors=vectors[lo:hi],
+                payload=payloads[lo:hi],
+                ids=ids[lo:hi],
+                batch_size=self.UPSERT_BATCH_SIZE,
+                wait=wait,
             )
+        return n
+    
 
-        self.client.upsert(
+    def get_texts(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """
+        Payload text of the given chunk ids ("<doc_id>#chunk<n>"); unknown ids are left out.
+        One retrieve call, payload text only (no vectors).
+        """
+        if not chunk_ids:
+            return {}
+        ids = [self._point_id(chunk_id.rpartition("#chunk")[0] or chunk_id, chunk_id) for chunk_id in chunk_ids]
+        points = self.client.retrieve(
             collection_name=self.collection,
-            points=rest.Batch(ids=ids, vectors=vectors, payloads=payloads),
+            ids=ids,
+            with_payload=["chunk_id", "text"],
+            with_vectors=False,
         )
-        return len(items)
-    
+        return {
+            p.payload["chunk_id"]: p.payload.get("text", "")
+            for p in points
+            if p.payload and "chunk_id" in p.payload
+        }
 
     def search(self, query: str, k: int, embed_func):
         qv = embed_func(query)
         if isinstance(qv, np.ndarray):
             qv = qv.astype("float32").tolist()
 
-        hits = self.client.search(
+        hits = self.client.query_points(
             collection_name=self.collection,
-            query_vector=qv,
+            query=qv,
             limit=k,
-        )
+            with_payload=True,
+        ).points
 
         results = []
         for hit in hits:
@@ -1,18 +1,90 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional, Tuple
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+import asyncio
 import re
 
 import httpx
 import trafilatura
-from bs4 import BeautifulSoup
+from loguru import logger
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+
+# cookie/nav-ish micro-lines in the BeautifulSoup fallback (matched on the lowercased line)
+_RE_NAV = re.compile(r"cookie|privacy|terms|sign in|log in")
+# lone "\r" line breaks -> "\n" (C-level, after "\r\n" is folded)
+_CR_TO_LF = str.maketrans("\r", "\n")
+# the fallback only reads <title> and the <body>/<main> subtree; skip building <head> noise
+_FALLBACK_STRAINER = SoupStrainer(["title", "main", "body"])
+# non-content elements (common docs site noise) + layout containers, dropped from the fallback tree
+_FALLBACK_DROP_TAGS = ["script", "style", "noscript", "svg", "nav", "header", "footer", "aside"]
+
+
+def _parse_fallback(html: str) -> BeautifulSoup:
+    # lxml (libxml2) is much faster than the pure-Python parser; keep html.parser if it's missing
+    try:
+        return BeautifulSoup(html, "lxml", parse_only=_FALLBACK_STRAINER)
+    except FeatureNotFound:
+        return BeautifulSoup(html, "html.parser", parse_only=_FALLBACK_STRAINER)
+
+
+def _clean_fallback_text(raw: str) -> str:
+    """
+    Single pass over get_text() output:
+    - lines are stripped (covers trailing spaces and stray CRs)
+    - very short lines (menus/buttons) and short cookie/nav lines are dropped
+    - runs of blank lines collapse into one paragraph break
+    """
+    out: list[str] = []
+    blank = False  # last thing emitted was a paragraph break
+    for ln in raw.replace("\r\n", "\n").translate(_CR_TO_LF).split("\n"):
+        s = ln.strip()
+        if not s:
+            if out and not blank:
+                out.append("")  # keep paragraph breaks
+                blank = True
+            continue
+        if len(s) <= 2:
+            continue
+        if len(s) < 80 and _RE_NAV.search(s.lower()):
+            continue
+        out.append(s)
+        blank = False
+    if blank:
+        out.pop()
+    return "\n".join(out)
 
 
 @dataclass
 class WebLoaderService:
     timeout_s: float = 25.0
     user_agent: str = "LLM-Twin-Modern/0.1 (+RAG web ingest)"
+    # Built once so keep-alive connections (and HTTP/2 multiplexing) are reused across pages
+    _client: httpx.Client = field(init=False, repr=False, compare=False)
+    _aclient: httpx.AsyncClient = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        opts = dict(
+            timeout=self.timeout_s,
+            headers={
+                "User-Agent": self.user_agent,
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.9",
+            },
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32),
+        )
+        self._client = httpx.Client(**opts)
+        self._aclient = httpx.AsyncClient(**opts)
+
+    def close(self) -> None:
+        self._client.close()
+
+    async def aclose(self) -> None:
+        await self._aclient.aclose()
+        self._client.close()
 
     def fetch(self, url: str) -> Tuple[Optional[str], str]:
         """
@@ -25,22 +97,35 @@ class WebLoaderService:
             httpx.HTTPError on network problems
             ValueError if extraction produces empty text
         """
-        headers = {
-            "User-Agent": self.user_agent,
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.9",
-        }
-
         # 1) Download HTML
-        with httpx.Client(
-            timeout=self.timeout_s,
-            headers=headers,
-            follow_redirects=True,
-        ) as client:
-            resp = client.get(url)
-            resp.raise_for_status()
-            html = resp.text
+        resp = self._client.get(url)
+        resp.raise_for_status()
+        return self._extract(url, resp.text)
+
+    async def fetch_async(self, url: str) -> Tuple[Optional[str], str]:
+        """Async fetch(): downloads on the event loop, extracts in a worker thread (CPU-bound)."""
+        resp = await self._aclient.get(url)
+        resp.raise_for_status()
+        return await asyncio.to_thread(self._extract, url, resp.text)
+
+    async def fetch_many(
+        self, urls: Sequence[str], concurrency: int = 16
+    ) -> List[Tuple[Optional[str], str] | BaseException]:
+        """
+        fetch_async() for many URLs, at most `concurrency` in flight.
+
+        Results are in input order; a failed URL yields its exception instead of (title, text).
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(url: str) -> Tuple[Optional[str], str]:
+            async with sem:
+                return await self.fetch_async(url)
 
+        return await asyncio.gather(*(one(u) for u in urls), return_exceptions=True)
+
+    def _extract(self, url: str, html: str) -> Tuple[Optional[str], str]:
+        """(title, text) from downloaded HTML; raises ValueError like fetch()."""
         # 2) Title (best-effort)
         title: Optional[str] = None
         try:
@@ -67,16 +152,13 @@ class WebLoaderService:
 
         # 4) Fallback: BeautifulSoup text extraction (more brute-force)
         if not text:
-            soup = BeautifulSoup(html, "html.parser")
-
-            # Remove non-content elements (common docs site noise)
-            for tag in soup(["script", "style", "noscript", "svg"]):
-                tag.decompose()
+            soup = _parse_fallback(html)
 
-            # Optional: remove typical layout containers if present
-            # (safe-ish, but keep conservative)
-            for tag in soup.find_all(["nav", "header", "footer", "aside"]):
-                tag.decompose()
+            # Remove non-content elements and typical layout containers in one tree walk;
+            # tags nested in an already removed subtree are skipped
+            for tag in soup.find_all(_FALLBACK_DROP_TAGS):
+                if not tag.decomposed:
+                    tag.decompose()
 
             # If the page has a <main> element, prefer it
             main = soup.find("main")
@@ -84,32 +166,8 @@ class WebLoaderService:
 
             raw = base.get_text(separator="\n\n")
 
-            # Normalize whitespace
-            raw = raw.replace("\r\n", "\n").replace("\r", "\n")
-            raw = re.sub(r"[ \t]+\n", "\n", raw)      # trailing spaces
-            raw = re.sub(r"\n{3,}", "\n\n", raw)      # collapse blank lines
-
-            # Drop very short lines that are usually menus/buttons
-            lines = []
-            for ln in raw.split("\n"):
-                s = ln.strip()
-                if not s:
-                    lines.append("")  # keep paragraph breaks
-                    continue
-                if len(s) <= 2:
-                    continue
-                # drop cookie/nav-ish micro-lines
-                low = s.lower()
-                if any(p in low for p in ["cookie", "privacy", "terms", "sign in", "log in"]) and len(s) < 80:
-                    continue
-                lines.append(s)
-
-            cleaned = "\n".join(lines)
-            cleaned = re.sub(r"\n{3,}", "\n\n", cleaned).strip()
-            text = cleaned
-            
-            print("EXTRACT LEN:", len(text), "DOUBLE-NL COUNT:", text.count("\n\n"))
-
+            text = _clean_fallback_text(raw)
+            logger.debug("Fallback extraction for {}: {} chars, {} paragraph breaks", url, len(text), text.count("\n\n"))
 
             # Title fallback from HTML <title>
             if not title:
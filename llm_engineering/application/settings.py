@@ -1,7 +1,5 @@
 from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import AnyUrl
-from typing import Optional
 
 # Application settings using pydantic-settings for structured configuration
 
@@ -16,13 +14,61 @@ class Settings(BaseSettings):
     qdrant_api_key: str | None = None
     # Default collection name
     qdrant_collection: str = "documents"
+    # Point ids from (doc_id, chunk_id): "blake2b", or "uuid5" for collections indexed with the old ids
+    # (so re-indexing overwrites points instead of duplicating them)
+    qdrant_point_id_hash: str = "blake2b"
+    # talk to Qdrant over gRPC (protobuf) instead of REST/JSON; needs the gRPC port reachable
+    qdrant_prefer_grpc: bool = True
+    qdrant_grpc_port: int = 6334
 
     # Embeddings (MiniLM-L6-v2 is 384)
     embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
     embedding_dim: int = 384
+    # texts per forward pass when indexing (larger batches = better GPU/CPU utilization)
+    embedding_batch_size: int = 64
+    # torch intra-op threads for the embedder; None -> min(cpu_count, 16)
+    embedding_num_threads: int | None = None
+    # "torch", or "onnx" / "openvino" (needs sentence-transformers[onnx] / [openvino]);
+    # embedding_model_file picks a specific export, e.g. "onnx/model_O4.onnx"
+    embedding_backend: str = "torch"
+    embedding_model_file: str | None = None
+    # None lets sentence-transformers pick (cuda if available), or e.g. "cpu" / "cuda:0"
+    embedding_device: str | None = None
+    # "fp32", or "fp16" / "bf16" for the torch backend on a CUDA device
+    embedding_precision: str = "fp32"
+    # CPU ingest: tokenize batches in this many DataLoader worker processes while the model
+    # runs (torch backend, e.g. min(4, cpu_count // 2)); only used for ingests of 2048+ chunks,
+    # smaller ones (and 0) tokenize inline in encode()
+    embedding_num_workers: int = 0
 
     # Switch: use qdrant if URL is set
     use_qdrant: bool = False
+
+    # In-memory FAISS index instead of the plain dense store (ignored when qdrant is used)
+    use_faiss: bool = False
+    # FAISS index_factory string: "Flat" (exact), or e.g. "IVF256,Flat" / "IVF256,PQ48x8" for
+    # large corpora (approximate; trained once 39*nlist vectors are in); nprobe = lists scanned per query
+    faiss_index_factory: str = "Flat"
+    faiss_nprobe: int = 8
+    # Vector storage for the plain dense store: "float32" or "int8" (4x smaller, approximate scores)
+    dense_precision: str = "float32"
+    # float32 dense store switches from exact scan to an HNSW graph at this many vectors; 0 = always exact.
+    # HNSW is approximate (recall@10 ~0.98: a true top-k chunk is occasionally missed); ~1000 is a sensible
+    # threshold when search latency on a large corpus matters more than exactness
+    dense_hnsw_min_rows: int = 0
+    # exact dense scans: pick candidates by sign-bit Hamming distance, rescore only those
+    dense_binary_prefilter: bool = False
+
+    # cache of RAGService.search results keyed on (query, k, index generation); 0 disables it
+    search_cache_size: int = 512
+    # max age (s) of a cached search result; bounds staleness after writes by other processes
+    search_cache_ttl: float = 300.0
+    # LRU cache of query embeddings (question -> vector) inside the shared embedder; 0 disables it
+    query_embed_cache_size: int = 1024
+
+    # Docs up to this many chars are indexed as a single chunk without running the chunker
+    # (ChunkerService.target_chars is 350); 0 sends every doc through the chunker
+    chunk_bypass_chars: int = 350
     
     
     # --- MongoDB ---
@@ -31,18 +77,28 @@ class Settings(BaseSettings):
     mongo_collection_docs: str = "documents"
     mongo_collection_history: str = "interactions"
     use_mongo: bool = False
+    # How RAGService.index writes docs: "auto" (insert_many, upsert only duplicates), "upsert" or "insert"
+    mongo_write_mode: str = "auto"
+    # wire compression for Mongo traffic, in order of preference (zstd needs pymongo[zstd])
+    mongo_compressors: str = "zstd,zlib"
+
+    # Hash used to derive doc ids from URLs on /ingest/url: "blake2b" or "sha1"
+    # (sha1 reproduces ids from earlier ingests, so re-ingesting updates instead of duplicating)
+    doc_id_hash: str = "blake2b"
 
 
     # --- Services (we’ll wire them later) ---
-    # mongo_uri: Optional[str] = None       # keep simple for now
-    # qdrant_url: Optional[AnyUrl] = None   # URL gets validated if provided
-    openai_api_key: Optional[str] = None
+    openai_api_key: str | None = None
     
     
     # --- LLM: Ollama ---
     use_ollama: bool = True
     ollama_model: str = "phi3:latest"
     ollama_host: str = "http://localhost:11434"
+    # send a 1-token prompt at startup so the model is loaded before the first /ask
+    ollama_warmup: bool = True
+    # cap on each retrieved chunk's text inside the /ask prompt
+    max_context_chars_per_hit: int = 2000
 
     # pydantic v2 / pydantic-settings configuration
     model_config = SettingsConfigDict(
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from llm_engineering.application.services.mongo_store import MongoDocumentStore
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for the pymongo collection calls MongoDocumentStore makes:
+    insert_many / bulk_write(UpdateOne) / find, with server-like duplicate-_id errors.
+    """
+
+    def __init__(self):
+        self.docs: dict = {}
+        self.calls: list = []
+
+    def insert_many(self, docs, ordered=True):
+        self.calls.append("insert_many")
+        errors, inserted = [], 0
+        for i, doc in enumerate(docs):
+            if doc["_id"] in self.docs:
+                errors.append({"index": i, "code": 11000, "op": doc})
+            else:
+                self.docs[doc["_id"]] = dict(doc)
+                inserted += 1
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": inserted})
+        return SimpleNamespace(inserted_ids=[doc["_id"] for doc in docs])
+
+    def bulk_write(self, ops, ordered=True):
+        self.calls.append("bulk_write")
+        upserted = modified = 0
+        for op in ops:
+            assert isinstance(op, UpdateOne)
+            doc_id, update = op._filter["_id"], op._doc
+            doc = self.docs.get(doc_id)
+            if doc is None:
+                if not op._upsert:
+                    continue
+                doc = self.docs[doc_id] = {"_id": doc_id, **update.get("$setOnInsert", {})}
+                upserted += 1
+            else:
+                modified += 1
+            doc.update(update.get("$set", {}))
+        return SimpleNamespace(upserted_count=upserted, modified_count=modified)
+
+    def find(self, flt, projection=None):
+        ids = flt["_id"]["$in"]
+        docs = [dict(self.docs[i]) for i in ids if i in self.docs]
+        if "content_hash" in flt:
+            docs = [d for d in docs if "content_hash" in d]
+        return _Cursor(docs)
+
+
+class _Cursor(list):
+    def hint(self, index):
+        return self
+
+    def batch_size(self, n):
+        return self
+
+
+@pytest.fixture
+def doc_store() -> MongoDocumentStore:
+    # MongoClient connects lazily, so nothing is contacted before the collection is swapped out
+    store = MongoDocumentStore("mongodb://localhost:27017", "test", "documents", compressors="zlib")
+    store.collection = FakeCollection()
+    return store
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+# main imports RAGService, which imports the sentence-transformers embedder module
+pytest.importorskip("sentence_transformers")
+from fastapi.testclient import TestClient
+
+from llm_engineering.application.api.main import app, rag_service_dep
+from llm_engineering.application.services.rag_service import Hit
+from llm_engineering.application.settings import Settings
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class FakeHistoryStore:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def recent(self, limit):
+        self.calls.append(("recent", _on_event_loop()))
+        created = datetime(2026, 1, 2, tzinfo=timezone.utc)
+        return [{"_id": "h1", "question": "q", "created_at": created, "sources": [{"id": "a#chunk0", "score": 0.5}]}]
+
+
+class FakeRAG:
+    """Records which blocking RAGService calls ran on the event loop thread."""
+
+    def __init__(self):
+        self.calls: list = []
+        self.settings = Settings(use_ollama=False, use_mongo=False)
+        self.history_store = FakeHistoryStore(self.calls)
+        self.doc_store = None
+
+    def index(self, items):
+        self.calls.append(("index", _on_event_loop()))
+        return len(items)
+
+    def search(self, query, k):
+        self.calls.append(("search", _on_event_loop()))
+        return [Hit("a#chunk0", 0.123456789, "Qdrant is a vector database."), Hit("b#chunk0", 0.1, "Mongo.")][:k]
+
+    def hydrate_sources(self, sources):
+        self.calls.append(("hydrate_sources", _on_event_loop()))
+        for src in sources:
+            src["text"] = "Qdrant is a vector database."
+        return sources
+
+
+@pytest.fixture
+def api():
+    rag = FakeRAG()
+    app.dependency_overrides[rag_service_dep] = lambda: rag
+    # no `with`: the lifespan (model load, Mongo/Qdrant connections) is not run
+    yield TestClient(app), rag
+    app.dependency_overrides.clear()
+
+
+def test_index_runs_off_the_event_loop(api):
+    client, rag = api
+    resp = client.post("/index", json=[{"id": "a", "text": "alpha"}, {"id": "b", "text": "beta"}])
+    assert resp.status_code == 200
+    assert resp.json() == {"indexed": 2}
+    assert rag.calls == [("index", False)]
+
+
+def test_search_returns_orjson_hits(api):
+    client, rag = api
+    resp = client.get("/search", params={"q": "vector database", "k": 2})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    # Hit dataclasses serialized as-is: full-precision scores, no rounding
+    assert resp.json() == [
+        {"id": "a#chunk0", "score": 0.123456789, "text": "Qdrant is a vector database."},
+        {"id": "b#chunk0", "score": 0.1, "text": "Mongo."},
+    ]
+    assert rag.calls == [("search", False)]
+
+
+def test_history_runs_off_the_event_loop(api):
+    client, rag = api
+    resp = client.get("/history", params={"limit": 5, "include_text": True})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["count"] == 1
+    assert body["items"][0]["created_at"] == "2026-01-02T00:00:00+00:00"
+    assert body["items"][0]["sources"] == [{"id": "a#chunk0", "score": 0.5, "text": "Qdrant is a vector database."}]
+    assert rag.calls == [("recent", False), ("hydrate_sources", False)]
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from llm_engineering.application.services.chunker import ChunkerService
+
+
+def _paragraph(rnd: random.Random, sentences: int) -> str:
+    words = "alpha beta gamma delta model vector search index data chunk".split()
+    return " ".join(
+        " ".join(rnd.choice(words) for _ in range(rnd.randint(4, 30))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+def _document(seed: int) -> str:
+    rnd = random.Random(seed)
+    return "\n\n".join(_paragraph(rnd, rnd.choice([2, 5, 12, 25])) for _ in range(rnd.randint(1, 8)))
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_chunk_ids_are_sequential(seed):
+    ids = [chunk_id for chunk_id, _ in ChunkerService().chunk("doc", _document(seed))]
+    assert ids == [f"doc#chunk{i}" for i in range(len(ids))]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_chunks_respect_max_chars(seed):
+    chunker = ChunkerService()
+    # before _fix_pronoun_starts, which may prepend the previous chunk's last paragraph
+    for _, text in chunker._iter_chunks("doc", _document(seed)):
+        assert 0 < len(text) <= chunker.max_chars
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_no_chunk_is_only_the_carried_overlap(seed):
+    chunks = [text for _, text in ChunkerService()._iter_chunks("doc", _document(seed))]
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert cur != prev.split("\n\n")[-1]
+
+
+def test_chunks_follow_document_order():
+    paragraphs = [f"Paragraph {i} talks about vectors and models in some detail here. " * 3 for i in range(8)]
+    chunks = [text for _, text in ChunkerService().chunk("doc", "\n\n".join(paragraphs))]
+    firsts = [int(text.split()[1]) for text in chunks]
+    assert firsts == sorted(firsts)
+    # every paragraph ends up in some chunk
+    assert all(any(p.strip() in text for text in chunks) for p in paragraphs)
+
+
+def test_overlap_carries_last_paragraph():
+    paragraphs = [f"Paragraph {i} talks about vectors and models in some detail here. " * 3 for i in range(4)]
+    chunks = [text for _, text in ChunkerService().chunk("doc", "\n\n".join(paragraphs))]
+    assert len(chunks) >= 2
+    assert chunks[1].split("\n\n")[0] == chunks[0].split("\n\n")[-1]
+
+
+def test_clean_drops_boilerplate_and_matches_chunk():
+    chunker = ChunkerService()
+    assert chunker.clean("We use cookies. Accept all cookies to continue.\nManage cookies") == ""
+    text = "Qdrant is a vector database.\nIt stores embeddings."
+    assert chunker.clean(text) == [t for _, t in chunker.chunk("doc", text)][0]
@@ -0,0 +1,52 @@
+import pytest
+from pymongo.errors import BulkWriteError
+
+
+@pytest.mark.parametrize("mode", ["upsert", "insert", "auto"])
+def test_upsert_documents_fresh(doc_store, mode):
+    n = doc_store.upsert_documents([("a", "alpha"), {"id": "b", "text": "beta", "title": "B"}], mode=mode)
+    assert n == 2
+    docs = doc_store.collection.docs
+    assert docs["a"]["text"] == "alpha" and docs["a"]["source"] == "manual"
+    assert docs["b"]["title"] == "B"
+    assert "created_at" in docs["a"] and "updated_at" in docs["a"]
+
+
+@pytest.mark.parametrize("mode", ["upsert", "auto"])
+def test_upsert_documents_overwrites_existing(doc_store, mode):
+    doc_store.upsert_documents([("a", "old")], mode="insert")
+    created = doc_store.collection.docs["a"]["created_at"]
+    n = doc_store.upsert_documents([("a", "new"), ("b", "fresh")], mode=mode)
+    assert n == 2
+    assert doc_store.collection.docs["a"]["text"] == "new"
+    assert doc_store.collection.docs["a"]["created_at"] == created
+    assert doc_store.collection.docs["b"]["text"] == "fresh"
+
+
+def test_auto_mode_upserts_only_duplicates(doc_store):
+    doc_store.upsert_documents([("a", "old")], mode="insert")
+    doc_store.collection.calls.clear()
+    doc_store.upsert_documents([("a", "new"), ("b", "fresh")], mode="auto")
+    assert doc_store.collection.calls == ["insert_many", "bulk_write"]
+
+
+def test_insert_mode_fails_on_existing_id(doc_store):
+    doc_store.upsert_documents([("a", "old")], mode="insert")
+    with pytest.raises(BulkWriteError):
+        doc_store.upsert_documents([("a", "new")], mode="insert")
+
+
+def test_upsert_documents_rejects_bad_items(doc_store):
+    with pytest.raises(ValueError):
+        doc_store.upsert_documents([("a", "text", "extra")])
+    with pytest.raises(TypeError):
+        doc_store.upsert_documents([["a", "text"]])
+    with pytest.raises(ValueError):
+        doc_store.upsert_documents([("a", "text")], mode="replace")
+
+
+def test_get_texts_reflects_writes(doc_store):
+    doc_store.upsert_documents([("a", "alpha")])
+    assert doc_store.get_texts(["a", "missing"]) == {"a": "alpha", "missing": ""}
+    doc_store.upsert_documents([("a", "changed")])
+    assert doc_store.get_texts(["a"]) == {"a": "changed"}
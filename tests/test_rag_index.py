@@ -0,0 +1,153 @@
+import zlib
+
+import numpy as np
+import pytest
+
+# RAGService imports the sentence-transformers embedder module
+pytest.importorskip("sentence_transformers")
+
+from llm_engineering.application.settings import Settings
+from llm_engineering.application.services.chunker import ChunkerService
+from llm_engineering.application.services.rag_service import RAGService
+from llm_engineering.application.services.vector_store_dense import DenseVectorStore
+
+DIM = 64
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words vectors; counts embed_batch calls."""
+
+    def __init__(self):
+        self.batches = 0
+
+    def _vec(self, text: str) -> np.ndarray:
+        v = np.zeros(DIM, dtype=np.float32)
+        for word in text.lower().split():
+            v[zlib.crc32(word.encode()) % DIM] += 1.0
+        return v
+
+    def embed(self, text: str) -> np.ndarray:
+        return self._vec(text)
+
+    def embed_batch(self, texts, batch_size: int = 64) -> np.ndarray:
+        self.batches += 1
+        return np.stack([self._vec(t) for t in texts])
+
+
+class RecordingQdrantStore:
+    """Stands in for QdrantVectorStore: records index_many calls."""
+
+    def __init__(self):
+        self.indexed: list = []
+
+    def index_many(self, items, vectors) -> int:
+        self.indexed.extend(chunk_id for _, chunk_id, _ in items)
+        return len(items)
+
+
+def _settings(**overrides) -> Settings:
+    return Settings(**{"use_ollama": False, "use_mongo": False, "search_cache_size": 0, **overrides})
+
+
+def _dense_service(**overrides) -> RAGService:
+    return RAGService(
+        settings=_settings(**overrides),
+        embedder=HashingEmbedder(),
+        store=DenseVectorStore(),
+        backend="dense",
+        chunker=ChunkerService(),
+    )
+
+
+def _qdrant_service(doc_store, store, **overrides) -> RAGService:
+    return RAGService(
+        settings=_settings(**overrides),
+        embedder=HashingEmbedder(),
+        store=store,
+        backend="qdrant",
+        doc_store=doc_store,
+        chunker=ChunkerService(),
+    )
+
+
+def test_unchanged_docs_are_skipped():
+    rag = _dense_service()
+    docs = [("a", "Qdrant is a vector database."), ("b", "Mongo stores the raw documents.")]
+    assert rag.index(docs) == 2
+    assert rag.index(docs) == 2  # existing chunks are still counted
+    assert rag.embedder.batches == 1
+
+
+def test_changed_doc_is_reindexed():
+    rag = _dense_service()
+    rag.index([("a", "Qdrant is a vector database."), ("b", "Mongo stores the raw documents.")])
+    assert rag.index([("a", "Qdrant stores embeddings for similarity search.")]) == 1
+    assert rag.embedder.batches == 2
+    assert rag.search("embeddings similarity", k=1)[0].text.startswith("Qdrant stores")
+
+
+def test_search_overlapping_index_is_not_served_afterwards():
+    rag = _dense_service(search_cache_size=16)
+    rag.index([("a", "Qdrant is a vector database.")])
+    store_search = rag.store.search
+
+    def search_racing_index(query_vec, k=5):
+        # a /search that reads the store, then an /index that completes before the search returns
+        hits = store_search(query_vec, k)
+        rag.store.search = store_search
+        rag.index([("b", "Another vector database.")])
+        return hits
+
+    rag.store.search = search_racing_index
+    assert [h.id for h in rag.search("vector database", k=5)] == ["a#chunk0"]
+    assert sorted(h.id for h in rag.search("vector database", k=5)) == ["a#chunk0", "b#chunk0"]
+
+
+def test_empty_and_duplicate_docs():
+    rag = _dense_service()
+    assert rag.index([("a", "   "), ("b", "")]) == 0
+    assert rag.index([("c", "first version"), ("c", "second version")]) == 1
+    assert [h.text for h in rag.search("second version", k=5)] == ["second version"]
+
+
+def test_short_docs_bypass_chunker_but_are_cleaned():
+    rag = _dense_service()
+    banner = "We use cookies. Accept all cookies to continue.\nManage cookies"
+    assert rag.index([("banner", banner)]) == 0
+    text = "Qdrant is a vector database.\nManage cookies\nIt stores embeddings."
+    assert rag.index([("a", text)]) == 1
+    assert rag.store.get_texts(["a#chunk0"]) == {"a#chunk0": rag.chunker.clean(text)}
+    assert "cookies" not in rag.chunker.clean(text)
+
+
+def test_index_state_survives_restart(doc_store):
+    store = RecordingQdrantStore()
+    docs = [("a", "Qdrant is a vector database.")]
+    doc_store.upsert_documents(docs)
+    assert _qdrant_service(doc_store, store).index(docs) == 1
+
+    # a new service (e.g. after a restart) trusts the state recorded in Mongo
+    restarted = _qdrant_service(doc_store, store)
+    assert restarted.index(docs) == 1
+    assert restarted.embedder.batches == 0
+    assert store.indexed == ["a#chunk0"]
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"embedding_model_name": "sentence-transformers/all-mpnet-base-v2"},
+        {"qdrant_collection": "documents_v2"},
+        {"chunk_bypass_chars": 0},
+    ],
+)
+def test_config_change_forces_reindex(doc_store, change):
+    store = RecordingQdrantStore()
+    docs = [("a", "Qdrant is a vector database.")]
+    doc_store.upsert_documents(docs)
+    _qdrant_service(doc_store, store).index(docs)
+
+    changed = _qdrant_service(doc_store, store, **change)
+    assert changed.index(docs) == 1
+    assert changed.embedder.batches == 1
+    assert store.indexed == ["a#chunk0", "a#chunk0"]
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from llm_engineering.application.services.embedder import SimpleEmbedder
+from llm_engineering.application.services.vector_store import InMemoryVectorStore
+from llm_engineering.application.services.vector_store_dense import DenseVectorStore
+from llm_engineering.application.services.vector_store_faiss import FaissVectorStore
+
+DOCS = [
+    ("d0", "Cats chase mice around the house."),
+    ("d1", "Dogs chase cats and sometimes mice."),
+    ("d2", "Qdrant is a vector database for embeddings."),
+    ("d3", "FAISS searches dense vectors quickly."),
+    ("d4", "Mongo stores the raw documents and metadata."),
+    ("d5", "Birds fly south for the winter."),
+    ("d6", "Vector search ranks documents by cosine similarity."),
+    ("d7", "Mice are small rodents that cats like to chase."),
+]
+QUERIES = ["cats chase mice", "vector database", "dense vectors search", "raw documents", "winter birds"]
+
+
+def _tf_vectors(texts):
+    # the sparse store's TF vectors, laid out densely over a shared vocabulary
+    embedder = SimpleEmbedder()
+    vocab: dict = {}
+    matrix = embedder.embed_batch(texts, vocab).toarray()
+    return embedder, vocab, matrix
+
+
+def _dense_query(embedder, vocab, query):
+    q = np.zeros(len(vocab), dtype=np.float32)
+    for term, w in embedder.embed(query).items():
+        if term in vocab:
+            q[vocab[term]] = w
+    return q
+
+
+def _assert_same_hits(hits, reference, all_scores):
+    # same top-k scores; ids may differ only among tied scores, so check each id's own score
+    assert [score for _, score, _ in hits] == pytest.approx([score for _, score, _ in reference], abs=1e-5)
+    for doc_id, score, _ in hits:
+        assert score == pytest.approx(all_scores[doc_id], abs=1e-5)
+    assert len({doc_id for doc_id, _, _ in hits}) == len(hits)
+
+
+def _all_scores(sparse, query):
+    return {doc_id: score for doc_id, score, _ in sparse.search(query, len(DOCS))}
+
+
+@pytest.fixture
+def stores():
+    embedder, vocab, matrix = _tf_vectors([text for _, text in DOCS])
+    sparse = InMemoryVectorStore(embedder)
+    sparse.add_many(DOCS)
+    dense = DenseVectorStore()
+    dense.add_many(DOCS, matrix)
+    faiss_store = FaissVectorStore(matrix.shape[1])
+    faiss_store.add_many(DOCS, matrix)
+    return embedder, vocab, sparse, dense, faiss_store
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("k", [1, 3, len(DOCS)])
+def test_search_parity(stores, query, k):
+    embedder, vocab, sparse, dense, faiss_store = stores
+    q = _dense_query(embedder, vocab, query)
+    reference, all_scores = sparse.search(query, k), _all_scores(sparse, query)
+    _assert_same_hits(dense.search(q, k), reference, all_scores)
+    _assert_same_hits(faiss_store.search(q, k), reference, all_scores)
+
+
+def test_readding_an_id_replaces_it(stores):
+    embedder, vocab, sparse, dense, faiss_store = stores
+    text = "Birds chase mice for the winter."  # only words already in the vocabulary
+    sparse.add("d5", text)
+    dense.add("d5", text, _dense_query(embedder, vocab, text))
+    faiss_store.add("d5", text, _dense_query(embedder, vocab, text))
+    q = _dense_query(embedder, vocab, "birds chase")
+    reference, all_scores = sparse.search("birds chase", len(DOCS)), _all_scores(sparse, "birds chase")
+    assert reference[0][::2] == ("d5", text)
+    for store in (dense, faiss_store):
+        hits = store.search(q, len(DOCS))
+        assert hits[0][::2] == ("d5", text)
+        _assert_same_hits(hits, reference, all_scores)
+
+
+def test_hnsw_replacement_keeps_one_result_per_id():
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((300, 16)).astype(np.float32)
+    store = DenseVectorStore(hnsw_min_rows=1)
+    store.add_many([(f"c{i}", "old") for i in range(300)], vectors)
+    store.search(vectors[0], 5)  # builds the graph
+    store.add("c7", "new", -vectors[7])
+    hits = store.search(-vectors[7], 10)
+    assert hits[0][:1] == ("c7",) and hits[0][2] == "new"
+    assert len({doc_id for doc_id, _, _ in hits}) == len(hits)
+
+
+def test_int8_scores_close_to_float32():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((200, 32)).astype(np.float32)
+    items = [(f"c{i}", f"text {i}") for i in range(200)]
+    exact, quantized = DenseVectorStore(), DenseVectorStore(precision="int8")
+    for start in range(0, 200, 5):  # small batches: calibration waits for 32 rows
+        exact.add_many(items[start:start + 5], vectors[start:start + 5])
+        quantized.add_many(items[start:start + 5], vectors[start:start + 5])
+    for q in vectors[:10]:
+        assert quantized.search(q, 1)[0][0] == exact.search(q, 1)[0][0]
+        assert quantized.search(q, 1)[0][1] == pytest.approx(exact.search(q, 1)[0][1], abs=0.05)